@@ -10,8 +10,13 @@ USE_DEBUG_TOOLBAR = False
 # Gunicorn service port for manage.sh
 SERVER_PORT = 8000
 
+# Presence worker processes started by manage.sh, they share the channels
+PRESENCE_WORKERS = 1
+
 # Redis host
 REDIS_HOST = {"host": "localhost", "port": 6379}
+# Optional Redis shards for channel state, e.g.
+# REDIS_SHARDS = [{"host": "redis-1", "port": 6379}, {"host": "redis-2", "port": 6379}]
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
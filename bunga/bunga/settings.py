@@ -9,6 +9,65 @@ from django.urls import reverse_lazy
 SECRET_KEY = None
 USE_DEBUG_TOOLBAR = False
 REDIS_HOST = {"host": "localhost", "port": 6379}
+# Redis hosts holding channel state, channels are spread over them by a
+# consistent hash of their id. Empty means REDIS_HOST alone.
+REDIS_SHARDS = []
+# Treat the shards as nodes of one Redis Cluster instead
+REDIS_CLUSTER = False
+# Storage of channel state: "redis", or "memory" for single-process
+# deployments, which also switches to the in-memory channel layer
+CHANNEL_CACHE_BACKEND = "redis"
+# Watch progress kept in Redis per channel, and how often it is written to DB
+WATCH_PROGRESS_LIMIT = 100
+WATCH_PROGRESS_FLUSH_SECONDS = 30
+# Prefix of per-channel Redis keys, the default keeps keys of earlier versions.
+# Wrap channel ids in a hash tag ({channel_id}), forced on with REDIS_CLUSTER.
+CHANNEL_KEY_PREFIX = ":1:bunga:channel"
+CHANNEL_KEY_HASH_TAG = False
+# Presence worker policies by channel status: seconds between status checks
+# of a channel with clients, and seconds without heartbeat before a watcher
+# is dropped
+PRESENCE_POLICIES = {
+    "pending": {"status_interval": 0.5, "stale_seconds": 5},
+    "playing": {"status_interval": 1, "stale_seconds": 5},
+    "paused": {"status_interval": 3, "stale_seconds": 10},
+}
+# Channels with a single watcher, or without messages for
+# PRESENCE_IDLE_SECONDS, are checked this many times less often
+PRESENCE_IDLE_BACKOFF = 4
+PRESENCE_IDLE_SECONDS = 60
+# Seconds between heartbeat writes of a watcher sending messages
+WATCHER_TOUCH_INTERVAL = 1
+# Full channel status sent this often, status changes are sent as deltas
+PRESENCE_KEEPALIVE_SECONDS = 15
+# Presence workers lease the channels they serve, a channel moves to
+# another worker this long after its owner died
+PRESENCE_LEASE_SECONDS = 10
+# Channels swept at the same time by one presence worker
+PRESENCE_SWEEP_CONCURRENCY = 64
+# Seconds spark, popmoji and danmaku of a room are gathered before being
+# sent as one batch, 0 sends each at once
+REACTION_BATCH_WINDOW = 0.075
+# Token buckets of client messages by code, as (messages per second, burst);
+# codes not listed share the "*" one. Messages over the budget are dropped.
+RATE_LIMITS = {
+    "*": (20, 40),
+    "client-status": (10, 20),
+    "seek": (4, 8),
+    "play": (4, 8),
+    "pause": (4, 8),
+    "danmaku": (3, 10),
+    "popmoji": (10, 20),
+    "spark": (10, 20),
+}
+# Also keep the budget of each user in Redis, shared by its connections
+RATE_LIMIT_SHARED = False
+# Messages waiting to be sent to a client before it is closed to resync.
+# Pending channel status is replaced by newer one and does not pile up.
+OUTBOUND_QUEUE_SIZE = 256
+# Per-channel service instances kept in memory by each process
+MULTITON_MAX_INSTANCES = 6000
+MULTITON_TTL_SECONDS = 30 * 60
 try:
     from .local_settings import *
 except ImportError:
@@ -180,6 +239,15 @@ CACHES = {
     },
 }
 
+# Channel state, Redis Cluster only has DB 0 and needs keys of a channel in
+# one slot
+CHANNEL_REDIS_SHARDS = [
+    f"redis://{host['host']}:{host['port']}/{0 if REDIS_CLUSTER else 1}"
+    for host in REDIS_SHARDS or [REDIS_HOST]
+]
+if REDIS_CLUSTER:
+    CHANNEL_KEY_HASH_TAG = True
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
@@ -192,12 +260,22 @@ DATABASES = {
 
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        # Room messages go through pub/sub once per process
+        "BACKEND": "server.chat.channel_layer.RoomFanoutChannelLayer",
         "CONFIG": {
-            "hosts": [(REDIS_HOST["host"], REDIS_HOST["port"])],
+            # channels_redis shards channels and groups over these itself,
+            # but does not speak Redis Cluster
+            "hosts": [
+                (host["host"], host["port"])
+                for host in (REDIS_SHARDS if not REDIS_CLUSTER else []) or [REDIS_HOST]
+            ],
         },
     },
 }
+if CHANNEL_CACHE_BACKEND == "memory":
+    CHANNEL_LAYERS = {
+        "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+    }
 
 
 # REST framework
@@ -3,35 +3,323 @@
 from typing import Any
 
 import asyncio
+import heapq
+import math
+import time
 from channels.consumer import AsyncConsumer
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache as Cache
 
 from server.chat.services.presence_service import ChannelPresenceService
+from server.chat.services.progress_service import flush_progresses
 from server.chat.channel_manager import channel_manager
-from server.chat.schemas import ChannelStatusSchema
-from server.chat.utils import broadcast_message
 from server.chat.channel_cache import ChannelCache
+from server.chat.metrics import metrics
+from server.chat.redis_pool import get_redis
+from utils.hash_ring import HashRing
+from utils.log import logger
 
 
-class PresenceWorker(AsyncConsumer):
+class PresenceRegistry:
+    """Live presence workers, each known by the name of its own inbox.
 
-    async def start_heartbeat(self, event: dict[str, Any]) -> None:
-        if hasattr(self, "is_running"):
+    Channels are spread over workers by a hash ring of these names. A
+    worker silent for a lease period drops out, and its channels move to
+    the others once their leases expire.
+    """
+
+    _key = Cache.make_key("bunga:presence:workers")
+
+    def __init__(self) -> None:
+        self.ring: HashRing | None = None
+
+    async def refresh(self, name: str) -> None:
+        now = time.time()
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.zadd(self._key, {name: now})
+        pipe.zremrangebyscore(
+            self._key, "-inf", f"({now - settings.PRESENCE_LEASE_SECONDS}"
+        )
+        pipe.zrange(self._key, 0, -1)
+        *_, names = await pipe.execute()
+
+        names = tuple(sorted(names))
+        if self.ring is None or self.ring.nodes != names:
+            logger.info(f"Presence workers: {', '.join(names)}")
+            self.ring = HashRing(names)
+
+
+class PresenceScheduler:
+    """Runs presence work of each channel at its own deadline.
+
+    A channel is swept at the earliest of its next status check, its least
+    recent watcher going stale and its own expiry, each paced by the
+    channel's PresencePolicy, so idle channels cost nothing until then. Wake
+    events from consumers pull a channel's deadline to now.
+
+    With the Redis backend several workers share the channels: each one
+    serves the channels the registry ring assigns to it, and holds a lease
+    on them while doing so, so no channel is swept twice.
+    """
+
+    def __init__(self) -> None:
+        # (deadline, channel id), outdated entries are skipped when popped
+        self._heap: list[tuple[float, str]] = []
+        self._deadlines: dict[str, float] = {}
+        self._woken = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._inbox_task: asyncio.Task | None = None
+
+        # Sweeps run as tasks, so a slow channel holds no other channel
+        self._sweeps: set[asyncio.Task] = set()
+        self._sweep_slots = asyncio.Semaphore(settings.PRESENCE_SWEEP_CONCURRENCY)
+        self._running: set[str] = set()
+        # Channels woken while being swept, swept again right after
+        self._rewake: set[str] = set()
+        # Last full channel status sent, per channel with clients
+        self._last_full: dict[str, float] = {}
+
+        self.distributed = settings.CHANNEL_CACHE_BACKEND != "memory"
+        self.registry = PresenceRegistry()
+        # Inbox channel name, also the lease owner
+        self.name = "local"
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def owns(self, channel_id: str) -> bool:
+        ring = self.registry.ring
+        return not self.distributed or (
+            ring is not None and ring.node_of(channel_id) == self.name
+        )
+
+    async def route_wake(self, channel_id: str) -> None:
+        """Wake the channel here, or in the worker owning it."""
+        ring = self.registry.ring
+        if not self.distributed or ring is None:
+            self.wake(channel_id)
             return
-        self.is_running = True
+
+        owner = ring.node_of(channel_id)
+        if owner == self.name:
+            self.wake(channel_id)
+        else:
+            await get_channel_layer().send(
+                owner, {"type": "channel.wake", "channel_id": channel_id}
+            )
+
+    def wake(self, channel_id: str) -> None:
+        self._schedule(channel_id, time.monotonic())
+        self._woken.set()
+
+    def _schedule(self, channel_id: str, deadline: float) -> None:
+        current = self._deadlines.get(channel_id)
+        if current is not None and current <= deadline:
+            return
+        self._deadlines[channel_id] = deadline
+        heapq.heappush(self._heap, (deadline, channel_id))
+        if self._heap[0][0] == deadline:
+            # Earlier than the loop planned to sleep, sweeps run as tasks
+            self._woken.set()
+
+    def _pop_due(self, now: float) -> list[tuple[str, float]]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, channel_id = heapq.heappop(self._heap)
+            if self._deadlines.get(channel_id) == deadline:
+                del self._deadlines[channel_id]
+                due.append((channel_id, deadline))
+        return due
+
+    async def _run(self) -> None:
+        lease = settings.PRESENCE_LEASE_SECONDS
+        if self.distributed:
+            await self._open_inbox()
+
+        last_flush = last_refresh = time.monotonic()
+        # Rescanned on the first iteration
+        last_rescan = -math.inf
 
         while True:
-            for channel_id in channel_manager.channels:
-                if channel_manager.clean_if_stale(channel_id):
+            self._woken.clear()
+            now = time.monotonic()
+
+            for channel_id, deadline in self._pop_due(now):
+                if channel_id in self._running:
+                    self._rewake.add(channel_id)
                     continue
+                task = asyncio.create_task(self._run_sweep(channel_id, deadline))
+                self._sweeps.add(task)
+                task.add_done_callback(self._sweeps.discard)
+
+            # Periodic work failing is retried in its next period, the loop
+            # keeps serving deadlines
+            try:
+                if self.distributed and now - last_refresh >= lease / 3:
+                    last_refresh = now
+                    await self.registry.refresh(self.name)
+
+                # Pick up channels whose wake event was lost, or which moved
+                # here
+                if now - last_rescan >= lease:
+                    last_rescan = now
+                    await self._rescan()
+
+                if now - last_flush >= settings.WATCH_PROGRESS_FLUSH_SECONDS:
+                    last_flush = now
+                    await flush_progresses(list(self._deadlines.keys() | self._running))
+
+                metrics.set_gauge("presence_scheduled_channels", len(self._deadlines))
+                metrics.set_gauge("presence_running_sweeps", len(self._running))
+                await metrics.maybe_publish()
+            except Exception:
+                logger.exception("Presence worker periodic work failed")
+
+            # Sleep until the next deadline, a wake event, or at most 1s for
+            # the periodic work above
+            timeout = 1.0
+            if self._heap:
+                timeout = min(timeout, max(self._heap[0][0] - time.monotonic(), 0))
+            try:
+                await asyncio.wait_for(self._woken.wait(), timeout)
+            except TimeoutError:
+                pass
+
+    async def _open_inbox(self) -> None:
+        """Register this worker and read wakes forwarded to it.
+
+        The inbox is made once, a restarted loop keeps its name and so its
+        place in the ring, and replaces the reader of the earlier run.
+        """
+        layer = get_channel_layer()
+        if self.name == "local":
+            self.name = await layer.new_channel("presence_worker.")
+        await self.registry.refresh(self.name)
+
+        if self._inbox_task is not None:
+            self._inbox_task.cancel()
+        self._inbox_task = asyncio.create_task(self._receive_forwarded(layer))
+
+    async def _rescan(self) -> None:
+        for channel_id in await channel_manager.channels():
+            if channel_id not in self._deadlines and self.owns(channel_id):
+                self.wake(channel_id)
+
+    async def _receive_forwarded(self, layer) -> None:
+        while True:
+            event = await layer.receive(self.name)
+            self.wake(event["channel_id"])
+
+    async def _run_sweep(self, channel_id: str, deadline: float) -> None:
+        self._running.add(channel_id)
+        try:
+            async with self._sweep_slots:
+                started = time.monotonic()
+                # How far behind its deadline the channel is served
+                metrics.observe("presence_lag_seconds", started - deadline)
+                await self._sweep(channel_id, deadline)
+                metrics.observe("presence_sweep_seconds", time.monotonic() - started)
+        except Exception:
+            # Retried on the next rescan
+            logger.exception(f"Presence sweep of {channel_id} failed")
+        finally:
+            self._running.discard(channel_id)
+            if channel_id in self._rewake:
+                self._rewake.discard(channel_id)
+                self.wake(channel_id)
+
+    async def _sweep(self, channel_id: str, deadline: float) -> None:
+        channel_cache = ChannelCache(channel_id)
+        lease = settings.PRESENCE_LEASE_SECONDS
+        if not self.owns(channel_id):
+            # Moved to another worker
+            await channel_cache.release_presence(self.name)
+            return
+        if not await channel_cache.claim_presence(self.name, lease):
+            # Still leased by its previous owner, retried on rescan
+            return
+
+        if await channel_manager.clean_if_stale(channel_id):
+            self._last_full.pop(channel_id, None)
+            # The position saved on cleanup, the periodic flush no longer
+            # sees the channel
+            await flush_progresses([channel_id])
+            return
+
+        presence = ChannelPresenceService(channel_id)
+        snapshot = await channel_cache.snapshot()
+        policy = presence.policy(snapshot)
+        if await presence.remove_stale_user(policy.stale_seconds):
+            # Read again for the status broadcast
+            snapshot = None
+
+        # Wall clock deadlines, the heap runs on the monotonic clock
+        wall_deadlines = []
+        # Renew the lease before it expires
+        if self.distributed:
+            wall_deadlines.append(time.time() + lease / 2)
+
+        next_tick = None
+        if await channel_cache.has_client():
+            now = time.monotonic()
+            full = now - self._last_full.get(channel_id, -math.inf) >= (
+                settings.PRESENCE_KEEPALIVE_SECONDS
+            )
+            if full:
+                self._last_full[channel_id] = now
+            await presence.broadcast_status(full, snapshot)
+            next_tick = _next_tick(deadline, policy.status_interval)
+        else:
+            self._last_full.pop(channel_id, None)
+            wall_deadlines.append(await channel_manager.expires_at(channel_id) or 0)
+
+        oldest_active = await channel_cache.oldest_watcher_active()
+        if oldest_active is not None:
+            wall_deadlines.append(oldest_active + policy.stale_seconds)
+
+        now = time.monotonic()
+        deadlines = [now + max(d - time.time(), 0) for d in wall_deadlines]
+        if next_tick is not None:
+            deadlines.append(next_tick)
+        self._schedule(channel_id, min(deadlines))
+
+
+def _next_tick(deadline: float, interval: float) -> float:
+    """Next status tick at a fixed rate from the last one, skipping ticks
+    already missed, so the cadence does not drift with sweep time."""
+    now = time.monotonic()
+    next_tick = deadline + interval
+    if next_tick <= now:
+        next_tick += ((now - next_tick) // interval + 1) * interval
+    return next_tick
+
+
+scheduler = PresenceScheduler()
+
+
+class PresenceWorker(AsyncConsumer):
+
+    async def start_heartbeat(self, event: dict[str, Any]) -> None:
+        scheduler.start()
+
+    async def channel_wake(self, event: dict[str, Any]) -> None:
+        scheduler.start()
+        await scheduler.route_wake(event["channel_id"])
+
 
-                await ChannelPresenceService(channel_id).remove_stale_user()
+async def wake_presence(channel_id: str) -> None:
+    """Tell the presence worker something changed in a channel.
 
-                channel_cache = ChannelCache(channel_id)
-                data = ChannelStatusSchema.from_channel_cache(channel_cache)
-                await broadcast_message(
-                    channel_id,
-                    "channel-status",
-                    data=data,
-                )
+    With the memory cache backend the scheduler runs in this process, as a
+    separate worker could not see the state.
+    """
+    if settings.CHANNEL_CACHE_BACKEND == "memory":
+        scheduler.start()
+        scheduler.wake(channel_id)
+        return
 
-            await asyncio.sleep(1)
+    await get_channel_layer().send(
+        "presence_worker", {"type": "channel.wake", "channel_id": channel_id}
+    )
@@ -5,6 +5,7 @@ APP_NAME="bunga"
 WEB_PID="web.pid"
 WORKER_PID="worker.pid"
 DEFAULT_SERVER_PORT="8000"
+DEFAULT_PRESENCE_WORKERS="1"
 BIND_HOST="0.0.0.0"
 
 # --- Functions ---
@@ -21,6 +22,17 @@ resolve_server_port() {
     echo "$server_port"
 }
 
+resolve_presence_workers() {
+    local presence_workers
+    presence_workers=$(uv run python -c "from bunga.local_settings import PRESENCE_WORKERS; print(int(PRESENCE_WORKERS))" 2>/dev/null)
+
+    if [ -z "$presence_workers" ]; then
+        presence_workers="$DEFAULT_PRESENCE_WORKERS"
+    fi
+
+    echo "$presence_workers"
+}
+
 # Stop all running services
 stop_services() {
     echo "Stopping $APP_NAME services..."
@@ -34,9 +46,9 @@ stop_services() {
 
     if [ -f $WORKER_PID ]; then
         kill $(cat $WORKER_PID) && rm $WORKER_PID
-        echo "Stop Presence Worker: OK"
+        echo "Stop Presence Workers: OK"
     else
-        echo "Presence Worker is not running."
+        echo "Presence Workers are not running."
     fi
 }
 
@@ -58,11 +70,17 @@ start_services() {
     fi
     echo "Gunicorn (ASGI) started at ${BIND_HOST}:${server_port}."
 
-    # 2. Start Presence Worker
-    # Running presence_worker for real-time synchronization
-    nohup uv run python manage.py runworker presence_worker > worker.log 2>&1 &
-    echo $! > $WORKER_PID
-    echo "Presence Worker started."
+    # 2. Start Presence Workers
+    # Running presence_worker for real-time synchronization, channels are
+    # shared among the workers
+    local presence_workers
+    presence_workers=$(resolve_presence_workers)
+    : > $WORKER_PID
+    for i in $(seq 1 "$presence_workers"); do
+        nohup uv run python manage.py runworker presence_worker > "worker.$i.log" 2>&1 &
+        echo $! >> $WORKER_PID
+    done
+    echo "$presence_workers Presence Worker(s) started."
 }
 
 # Deploy/Update the project
@@ -92,6 +110,9 @@ deploy_project() {
     
     echo "Running database migrations..."
     uv run python manage.py migrate || return 1
+
+    echo "Migrating channel state in Redis..."
+    uv run python manage.py migrate_channel_state || return 1
     
     echo "Collecting static files for WhiteNoise..."
     uv run python manage.py collectstatic --noinput || return 1
@@ -1,382 +0,0 @@
-# PEP-8
-import asyncio
-from collections.abc import Awaitable
-from dataclasses import asdict, dataclass
-from datetime import datetime, timedelta
-from enum import Enum
-from typing import ClassVar, Self
-import json
-
-from django.core.cache import cache as Cache, caches as Caches
-from .multition_meta import MultitonMeta
-
-
-@dataclass(frozen=True)
-class UserInfo:
-    id: str
-    name: str
-    color_hue: int = 0
-
-    server: ClassVar[Self]
-
-
-UserInfo.server = UserInfo(id="server", name="server")
-
-
-@dataclass
-class VideoRecord:
-    record_id: str
-    title: str
-    source: str
-    path: str
-    thumb_url: str | None = None
-
-
-@dataclass
-class Projection:
-    record: VideoRecord
-    sharer: UserInfo
-
-
-class PlayStatus:
-    def __init__(self, playing: bool = False, position: timedelta = timedelta(0)):
-        self._position = position
-        self._play_at = None
-
-        self.playing = playing
-
-    @property
-    def playing(self) -> bool:
-        return self._play_at is not None
-
-    @playing.setter
-    def playing(self, value: bool) -> None:
-        if value and not self.playing:
-            self._play_at = datetime.now()
-            return
-
-        if not value and self.playing:
-            assert self._play_at is not None
-            delta = datetime.now() - self._play_at
-            self._position += delta
-            self._play_at = None
-            return
-
-    @property
-    def position(self) -> timedelta:
-        if not self.playing:
-            return self._position
-
-        assert self._play_at is not None
-        return self._position + (datetime.now() - self._play_at)
-
-    @position.setter
-    def position(self, value) -> None:
-        self._position = value
-        if self.playing:
-            self._play_at = datetime.now()
-
-
-class ChannelStatus(str, Enum):
-    PAUSED = "paused"
-    PENDING = "pending"
-    PLAYING = "playing"
-
-
-class ChannelCache(metaclass=MultitonMeta):
-
-    def __init__(self, channel_id: str):
-        self.channel_id = channel_id
-        self.keys = self.Keys(channel_id)
-
-    @property
-    def redis(self):
-        cache_backend = Caches["raw_redis"]
-        client = getattr(cache_backend, "_cache")
-        return client.get_client()
-
-    # Client channel name
-    def register_client(self, user_id: str, channel_name: str) -> None:
-        self.redis.hset(self.keys.clients.raw, user_id, channel_name)
-
-    def unregister_client(self, user_id: str) -> None:
-        self.redis.hdel(self.keys.clients.raw, user_id)
-
-    def get_client_name(self, user_id: str) -> str | None:
-        return self.redis.hget(self.keys.clients.raw, user_id)
-
-    @property
-    def has_client(self) -> bool:
-        return self.redis.hlen(self.keys.clients.raw) > 0
-
-    # Watcher info
-    @property
-    def watcher_list(self) -> list[UserInfo]:
-        raw_values = self.redis.hvals(self.keys.watchers.raw)
-        return [UserInfo(**json.loads(v)) for v in raw_values]
-
-    @property
-    def watcher_ids(self) -> list[str]:
-        return self.redis.hkeys(self.keys.watchers.raw)
-
-    def upsert_watcher(self, new_watcher: UserInfo) -> None:
-        watcher_data = json.dumps(asdict(new_watcher))
-        self.redis.hset(
-            self.keys.watchers.raw,
-            new_watcher.id,
-            watcher_data,
-        )
-
-    def get_watcher_info(self, user_id: str) -> UserInfo | None:
-        raw_data = self.redis.hget(self.keys.watchers.raw, user_id)
-        if raw_data is None:
-            return None
-        return UserInfo(**json.loads(raw_data))
-
-    def remove_watcher(self, user_id: str) -> UserInfo | None:
-        watcher = self.get_watcher_info(user_id)
-        if watcher is None:
-            return None
-
-        self.redis.hdel(self.keys.watchers.raw, user_id)
-        return watcher
-
-    def is_watcher(self, user_id: str) -> bool:
-        return self.redis.hexists(self.keys.watchers.raw, user_id)
-
-    @property
-    def has_watcher(self):
-        return self.redis.hlen(self.keys.watchers.raw) > 0
-
-    # Buffering watchers
-    @property
-    def ready_ids(self) -> set[str]:
-        return self.redis.smembers(self.keys.ready_watchers.raw)
-
-    @property
-    def buffering_ids(self) -> list[str]:
-        watcher_ids = self.watcher_ids
-        ready_ids = self.ready_ids
-        return [id for id in watcher_ids if id not in ready_ids]
-
-    def reset_all_watchers_to_buffering(self) -> None:
-        self.redis.delete(self.keys.ready_watchers.raw)
-
-    def set_watcher_status(self, watcher_id: str, is_pending: bool) -> bool:
-        if is_pending:
-            status_changed = self.redis.srem(self.keys.ready_watchers.raw, watcher_id)
-        else:
-            status_changed = self.redis.sadd(self.keys.ready_watchers.raw, watcher_id)
-
-        return status_changed
-
-    # Active watchers
-    def set_watcher_active(self, watcher_id: str) -> None:
-        self.redis.hset(
-            self.keys.watchers_last_active.raw,
-            watcher_id,
-            str(datetime.now().timestamp()),
-        )
-
-    def is_watcher_stale(self, watcher_id: str) -> bool:
-        raw_last_active = self.redis.hget(
-            self.keys.watchers_last_active.raw, watcher_id
-        )
-        if raw_last_active is None:
-            return True
-
-        try:
-            last_active = float(raw_last_active)
-        except (TypeError, ValueError):
-            self.remove_watcher_active_key(watcher_id)
-            return True
-
-        return (datetime.now().timestamp() - last_active) > 5
-
-    def remove_watcher_active_key(self, watcher_id: str):
-        self.redis.hdel(self.keys.watchers_last_active.raw, watcher_id)
-
-    @property
-    def is_all_watchers_ready(self) -> bool:
-        return len(self.buffering_ids) == 0
-
-    # Projection
-    @property
-    def current_projection(self) -> Projection | None:
-        return Cache.get(self.keys.projection)
-
-    @current_projection.setter
-    def current_projection(self, new_value: Projection | None) -> None:
-        Cache.set(self.keys.projection, new_value, None)
-
-    def clean_projection(self):
-        # Save watch progress if have
-        if self.current_projection is not None:
-            self.save_progress(
-                self.current_projection.record.record_id,
-                self.play_status.position,
-            )
-
-        self.current_projection = None
-        self.play_status = PlayStatus()
-        self.channel_status = ChannelStatus.PAUSED
-
-    # Channel status
-    @property
-    def channel_status(self) -> ChannelStatus:
-        try:
-            status = Cache.get(self.keys.channel_status, ChannelStatus.PAUSED)
-            return ChannelStatus(status)
-        except Exception:
-            return ChannelStatus.PAUSED
-
-    @channel_status.setter
-    def channel_status(self, new_value: ChannelStatus) -> None:
-        Cache.set(self.keys.channel_status, new_value, None)
-
-    # Play status
-    @property
-    def play_status(self) -> PlayStatus:
-        return Cache.get(self.keys.play_status, PlayStatus())
-
-    @play_status.setter
-    def play_status(self, new_value: PlayStatus) -> None:
-        Cache.set(self.keys.play_status, new_value, None)
-
-    def set_play(self, is_play: bool) -> None:
-        status = self.play_status
-        status.playing = is_play
-        self.play_status = status
-
-    def set_position(self, position: timedelta) -> None:
-        status = self.play_status
-        status.position = position
-        self.play_status = status
-
-    # Watch progress
-    def save_progress(self, record_id: str, position: timedelta) -> None:
-        data = {"position": position.total_seconds(), "updated_at": datetime.now()}
-        key = self.keys.watch_progresses.raw
-        client = self.redis
-
-        client.hset(key, record_id, json.dumps(data, default=str))
-
-        # TODO: clean up old progresses if needed
-
-    def get_progress(self, record_id: str) -> timedelta | None:
-        key = self.keys.watch_progresses.raw
-        client = self.redis
-
-        raw_data = client.hget(key, record_id)
-        if raw_data is None:
-            return None
-
-        data = json.loads(raw_data)
-        position_sec = data.get("position")
-        if position_sec is None:
-            return None
-
-        return timedelta(seconds=position_sec)
-
-    # Call
-    def init_call_pending_ids(self, call_id: str) -> bool:
-        watcher_ids = self.watcher_ids
-        watcher_ids.remove(call_id)
-        if not watcher_ids:
-            return False
-
-        self.redis.sadd(self.keys.call_pending_ids.raw, *watcher_ids)
-        return True
-
-    def remove_call_pending_id(self, response_id: str) -> None:
-        self.redis.srem(self.keys.call_pending_ids.raw, response_id)
-
-    def clear_call_pending_ids(self) -> None:
-        self.redis.delete(self.keys.call_pending_ids.raw)
-
-    @property
-    def has_pending_call(self) -> bool:
-        return self.redis.scard(self.keys.call_pending_ids.raw) > 0
-
-    def add_talking_id(self, user_id: str) -> None:
-        self.redis.sadd(self.keys.talking_ids.raw, user_id)
-
-    def remove_talking_id(self, user_id: str) -> None:
-        self.redis.srem(self.keys.talking_ids.raw, user_id)
-
-    @property
-    def talking_ids(self) -> set[str]:
-        return self.redis.smembers(self.keys.talking_ids.raw)
-
-    @property
-    def is_talking(self) -> bool:
-        # Clear stale ids
-        watcher_ids = self.watcher_ids
-        for id in self.talking_ids:
-            if id not in watcher_ids:
-                self.remove_talking_id(id)
-
-        return self.redis.scard(self.keys.talking_ids.raw) > 0
-
-    # Utils
-    def reset(self) -> None:
-        self.clean_projection()
-        self.redis.delete(self.keys.clients.raw)
-        self.redis.delete(self.keys.watchers.raw)
-        self.redis.delete(self.keys.watchers_last_active.raw)
-        self.redis.delete(self.keys.ready_watchers.raw)
-        self.redis.delete(self.keys.call_pending_ids.raw)
-        self.redis.delete(self.keys.talking_ids.raw)
-
-    class Keys:
-        def __init__(self, channel_id: str):
-            self.channel_id = channel_id
-            self.prefix = f"bunga:channel:{channel_id}"
-
-        class _Key(str):
-            def __new__(cls, key):
-                return super().__new__(cls, key)
-
-            @property
-            def raw(self):
-                return Cache.make_key(self)
-
-        @property
-        def projection(self):
-            return self._Key(f"{self.prefix}:projection")
-
-        @property
-        def clients(self):
-            return self._Key(f"{self.prefix}:clients")
-
-        @property
-        def watchers(self):
-            return self._Key(f"{self.prefix}:watchers")
-
-        @property
-        def ready_watchers(self):
-            return self._Key(f"{self.prefix}:ready_watchers")
-
-        @property
-        def watchers_last_active(self):
-            return self._Key(f"{self.prefix}:watchers_last_active")
-
-        @property
-        def channel_status(self):
-            return self._Key(f"{self.prefix}:channel_status")
-
-        @property
-        def play_status(self):
-            return self._Key(f"{self.prefix}:play_status")
-
-        @property
-        def watch_progresses(self):
-            return self._Key(f"{self.prefix}:watch_progresses")
-
-        @property
-        def call_pending_ids(self):
-            return self._Key(f"{self.prefix}:call_pending_ids")
-
-        @property
-        def talking_ids(self):
-            return self._Key(f"{self.prefix}:talking_ids")
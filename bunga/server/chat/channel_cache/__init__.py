@@ -0,0 +1,26 @@
+# PEP-8
+
+from django.conf import settings
+
+from .base import BaseChannelCache
+from .memory_cache import MemoryChannelCache
+from .redis_cache import RedisChannelCache
+from .types import (
+    ChannelSnapshot,
+    ChannelState,
+    ChannelStatus,
+    PlayStatus,
+    Projection,
+    PublishedStatus,
+    StateTransition,
+    UserInfo,
+    VideoRecord,
+)
+
+_BACKENDS: dict[str, type[BaseChannelCache]] = {
+    "redis": RedisChannelCache,
+    "memory": MemoryChannelCache,
+}
+
+# Backend chosen by settings.CHANNEL_CACHE_BACKEND
+ChannelCache = _BACKENDS[settings.CHANNEL_CACHE_BACKEND]
@@ -0,0 +1,243 @@
+# PEP-8
+
+from datetime import timedelta
+
+from ..multition_meta import MultitonMeta
+from .types import (
+    ChannelSnapshot,
+    ChannelState,
+    ChannelStatus,
+    PlayStatus,
+    Projection,
+    PublishedStatus,
+    StateTransition,
+    UserInfo,
+)
+
+
+class BaseChannelCache(metaclass=MultitonMeta):
+    """Storage of per-channel state, one instance per channel.
+
+    Backends implement the storage methods below, each of them atomic on
+    its own; settings.CHANNEL_CACHE_BACKEND picks the backend.
+    """
+
+    def __init__(self, channel_id: str):
+        self.channel_id = channel_id
+
+    # Channel index
+    async def set_channel_active(self) -> None:
+        raise NotImplementedError
+
+    async def channel_last_active(self) -> float | None:
+        raise NotImplementedError
+
+    async def remove_channel_active(self) -> None:
+        raise NotImplementedError
+
+    @classmethod
+    def shard_count(cls) -> int:
+        return 1
+
+    @classmethod
+    async def active_channel_ids(cls, shard: int = 0) -> list[str]:
+        raise NotImplementedError
+
+    # Presence worker owning the channel
+    async def claim_presence(self, owner: str, ttl: float) -> bool:
+        """Take or renew the lease of the channel for ttl seconds."""
+        raise NotImplementedError
+
+    async def release_presence(self, owner: str) -> None:
+        raise NotImplementedError
+
+    # Message budget of a user, shared by all its connections
+    async def take_token(
+        self, user_id: str, code: str, rate: float, burst: float, max_wait: float
+    ) -> float | None:
+        """Reserve a token of the user's bucket of code, see TokenBucket."""
+        raise NotImplementedError
+
+    # Client channel name
+    async def register_client(self, user_id: str, channel_name: str) -> None:
+        raise NotImplementedError
+
+    async def unregister_client(self, user_id: str) -> None:
+        raise NotImplementedError
+
+    async def get_client_name(self, user_id: str) -> str | None:
+        raise NotImplementedError
+
+    async def has_client(self) -> bool:
+        raise NotImplementedError
+
+    # Watcher info
+    async def watcher_list(self) -> list[UserInfo]:
+        raise NotImplementedError
+
+    async def watcher_ids(self) -> list[str]:
+        raise NotImplementedError
+
+    async def upsert_watcher(self, new_watcher: UserInfo) -> None:
+        raise NotImplementedError
+
+    async def get_watcher_info(self, user_id: str) -> UserInfo | None:
+        raise NotImplementedError
+
+    async def remove_watcher(self, user_id: str) -> UserInfo | None:
+        removed = await self.remove_watchers([user_id])
+        return removed[0] if removed else None
+
+    async def remove_watchers(self, user_ids: list[str]) -> list[UserInfo]:
+        """Remove watchers with their heartbeats, return the removed ones."""
+        raise NotImplementedError
+
+    async def is_watcher(self, user_id: str) -> bool:
+        raise NotImplementedError
+
+    async def has_watcher(self) -> bool:
+        raise NotImplementedError
+
+    # Buffering watchers
+    async def ready_ids(self) -> set[str]:
+        raise NotImplementedError
+
+    async def buffering_ids(self) -> set[str]:
+        raise NotImplementedError
+
+    async def reset_all_watchers_to_buffering(self) -> None:
+        raise NotImplementedError
+
+    async def set_watcher_status(
+        self, watcher_id: str, is_pending: bool
+    ) -> StateTransition:
+        # Re-evaluates PLAYING / PENDING in the same step if readiness changed
+        raise NotImplementedError
+
+    async def is_all_watchers_ready(self) -> bool:
+        return not await self.buffering_ids()
+
+    # Active watchers
+    async def set_watcher_active(self, watcher_id: str) -> None:
+        raise NotImplementedError
+
+    async def is_watcher_stale(self, watcher_id: str, timeout: float = 5) -> bool:
+        raise NotImplementedError
+
+    async def stale_watcher_ids(self, timeout: float = 5) -> list[str]:
+        raise NotImplementedError
+
+    async def remove_watcher_active_key(self, watcher_id: str) -> None:
+        raise NotImplementedError
+
+    async def oldest_watcher_active(self) -> float | None:
+        """Timestamp of the least recent watcher heartbeat."""
+        raise NotImplementedError
+
+    # State
+    async def state(self) -> ChannelState:
+        raise NotImplementedError
+
+    # Projection
+    async def current_projection(self) -> Projection | None:
+        return (await self.state()).projection
+
+    async def set_current_projection(self, new_value: Projection | None) -> None:
+        raise NotImplementedError
+
+    async def clean_projection(self) -> None:
+        # Save watch progress if have
+        state = await self.state()
+        if state.projection is not None:
+            await self.save_progress(
+                state.projection.record.record_id,
+                state.play_status.position,
+            )
+        await self._reset_state()
+
+    async def _reset_state(self) -> None:
+        raise NotImplementedError
+
+    # Channel status
+    async def channel_status(self) -> ChannelStatus:
+        return (await self.state()).status
+
+    async def translate_status(
+        self, target: ChannelStatus, position: timedelta | None = None
+    ) -> StateTransition:
+        # Position, if given, is applied before the transition
+        raise NotImplementedError
+
+    async def request_play(self) -> StateTransition:
+        raise NotImplementedError
+
+    async def resume_if_all_ready(self) -> StateTransition:
+        raise NotImplementedError
+
+    # Play status
+    async def play_status(self) -> PlayStatus:
+        return (await self.state()).play_status
+
+    async def reset_playback(self, position: timedelta = timedelta(0)) -> None:
+        raise NotImplementedError
+
+    async def set_position(self, position: timedelta) -> None:
+        # Moving the anchor keeps the rate, so seeking needs no read
+        raise NotImplementedError
+
+    # Watch progress
+    async def save_progress(self, record_id: str, position: timedelta) -> None:
+        raise NotImplementedError
+
+    async def get_progress(self, record_id: str) -> timedelta | None:
+        raise NotImplementedError
+
+    async def pop_dirty_progresses(self) -> dict[str, timedelta]:
+        """Take progresses saved since the last call, for writing them to DB."""
+        raise NotImplementedError
+
+    # Call
+    async def init_call_pending_ids(self, call_id: str) -> bool:
+        raise NotImplementedError
+
+    async def remove_call_pending_id(self, response_id: str) -> None:
+        raise NotImplementedError
+
+    async def clear_call_pending_ids(self) -> None:
+        raise NotImplementedError
+
+    async def has_pending_call(self) -> bool:
+        raise NotImplementedError
+
+    async def add_talking_id(self, user_id: str) -> None:
+        raise NotImplementedError
+
+    async def remove_talking_id(self, user_id: str) -> None:
+        raise NotImplementedError
+
+    async def talking_ids(self) -> set[str]:
+        raise NotImplementedError
+
+    async def is_talking(self) -> bool:
+        # Drop ids of users no longer watching, and count the rest
+        raise NotImplementedError
+
+    # Published status
+    async def publish_status(self, body: str) -> PublishedStatus:
+        """Store the status being broadcast, bumping its version if changed.
+
+        The version survives reset, so it only ever grows.
+        """
+        raise NotImplementedError
+
+    async def published_status(self) -> PublishedStatus | None:
+        raise NotImplementedError
+
+    # Snapshot
+    async def snapshot(self) -> ChannelSnapshot:
+        """Read all per-channel state in one step."""
+        raise NotImplementedError
+
+    # Utils
+    async def reset(self) -> None:
+        raise NotImplementedError
@@ -0,0 +1,399 @@
+# PEP-8
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+import asyncio
+import time
+
+from django.conf import settings
+
+from utils.datetime import get_epoch_microseconds, get_total_microseconds
+from utils.token_bucket import TokenBucket
+from .base import BaseChannelCache
+from .types import (
+    ChannelSnapshot,
+    ChannelState,
+    ChannelStatus,
+    PlayStatus,
+    Projection,
+    PublishedStatus,
+    StateTransition,
+    UserInfo,
+)
+
+# (current, target) -> rate after the transition, None keeps the rate;
+# missing pairs are not allowed. Mirrors RULES of scripts.py.
+_RULES: dict[tuple[ChannelStatus, ChannelStatus], float | None] = {
+    (ChannelStatus.PLAYING, ChannelStatus.PAUSED): 0.0,
+    (ChannelStatus.PENDING, ChannelStatus.PAUSED): 0.0,
+    (ChannelStatus.PLAYING, ChannelStatus.PENDING): 0.0,
+    (ChannelStatus.PENDING, ChannelStatus.PLAYING): 1.0,
+    (ChannelStatus.PAUSED, ChannelStatus.PENDING): None,
+    (ChannelStatus.PAUSED, ChannelStatus.PLAYING): 1.0,
+}
+
+
+@dataclass
+class _ChannelStore:
+    clients: dict[str, str] = field(default_factory=dict)
+    watchers: dict[str, UserInfo] = field(default_factory=dict)
+    ready_ids: set[str] = field(default_factory=set)
+    heartbeats: dict[str, float] = field(default_factory=dict)
+    state: ChannelState = field(default_factory=ChannelState)
+    # Least recently updated first
+    progresses: OrderedDict[str, timedelta] = field(default_factory=OrderedDict)
+    dirty_progresses: set[str] = field(default_factory=set)
+    call_pending_ids: set[str] = field(default_factory=set)
+    talking_ids: set[str] = field(default_factory=set)
+    status_version: int = 0
+    status_body: str | None = None
+    # (user id, code) -> message budget shared by the user's connections
+    rate_buckets: dict[tuple[str, str], TokenBucket] = field(default_factory=dict)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    @property
+    def is_all_watchers_ready(self) -> bool:
+        return self.watchers.keys() <= self.ready_ids
+
+
+_stores: dict[str, _ChannelStore] = {}
+_channels_last_active: dict[str, float] = {}
+
+
+class MemoryChannelCache(BaseChannelCache):
+    """Channel state in this process, for single-process deployments.
+
+    Only works with the in-memory channel layer and the presence loop
+    running in the same process, see bunga.workers.
+    """
+
+    @property
+    def store(self) -> _ChannelStore:
+        store = _stores.get(self.channel_id)
+        if store is None:
+            store = _stores[self.channel_id] = _ChannelStore()
+        return store
+
+    # Channel index
+    async def set_channel_active(self) -> None:
+        _channels_last_active[self.channel_id] = time.time()
+
+    async def channel_last_active(self) -> float | None:
+        return _channels_last_active.get(self.channel_id)
+
+    async def remove_channel_active(self) -> None:
+        _channels_last_active.pop(self.channel_id, None)
+
+    @classmethod
+    async def active_channel_ids(cls, shard: int = 0) -> list[str]:
+        return list(_channels_last_active)
+
+    # Presence worker owning the channel, always this process
+    async def claim_presence(self, owner: str, ttl: float) -> bool:
+        return True
+
+    async def release_presence(self, owner: str) -> None:
+        pass
+
+    # Message budget of a user, shared by all its connections
+    async def take_token(
+        self, user_id: str, code: str, rate: float, burst: float, max_wait: float
+    ) -> float | None:
+        buckets = self.store.rate_buckets
+        bucket = buckets.get((user_id, code))
+        if bucket is None:
+            bucket = buckets[user_id, code] = TokenBucket(rate, burst)
+        return bucket.take(max_wait)
+
+    # Client channel name
+    async def register_client(self, user_id: str, channel_name: str) -> None:
+        self.store.clients[user_id] = channel_name
+
+    async def unregister_client(self, user_id: str) -> None:
+        self.store.clients.pop(user_id, None)
+
+    async def get_client_name(self, user_id: str) -> str | None:
+        return self.store.clients.get(user_id)
+
+    async def has_client(self) -> bool:
+        return bool(self.store.clients)
+
+    # Watcher info
+    async def watcher_list(self) -> list[UserInfo]:
+        return list(self.store.watchers.values())
+
+    async def watcher_ids(self) -> list[str]:
+        return list(self.store.watchers)
+
+    async def upsert_watcher(self, new_watcher: UserInfo) -> None:
+        store = self.store
+        store.watchers[new_watcher.id] = new_watcher
+        store.heartbeats.setdefault(new_watcher.id, datetime.now().timestamp())
+
+    async def get_watcher_info(self, user_id: str) -> UserInfo | None:
+        return self.store.watchers.get(user_id)
+
+    async def remove_watchers(self, user_ids: list[str]) -> list[UserInfo]:
+        store = self.store
+        async with store.lock:
+            removed = []
+            for user_id in user_ids:
+                store.heartbeats.pop(user_id, None)
+                watcher = store.watchers.pop(user_id, None)
+                if watcher is not None:
+                    removed.append(watcher)
+            return removed
+
+    async def is_watcher(self, user_id: str) -> bool:
+        return user_id in self.store.watchers
+
+    async def has_watcher(self) -> bool:
+        return bool(self.store.watchers)
+
+    # Buffering watchers
+    async def ready_ids(self) -> set[str]:
+        return set(self.store.ready_ids)
+
+    async def buffering_ids(self) -> set[str]:
+        return self.store.watchers.keys() - self.store.ready_ids
+
+    async def reset_all_watchers_to_buffering(self) -> None:
+        self.store.ready_ids.clear()
+
+    async def set_watcher_status(
+        self, watcher_id: str, is_pending: bool
+    ) -> StateTransition:
+        store = self.store
+        async with store.lock:
+            changed = (watcher_id in store.ready_ids) == is_pending
+            if is_pending:
+                store.ready_ids.discard(watcher_id)
+            else:
+                store.ready_ids.add(watcher_id)
+
+            previous = store.state
+            if changed and previous.status != ChannelStatus.PAUSED:
+                self._evaluate_to_play(store, get_epoch_microseconds())
+            return replace(_transition(previous, store.state), ready_changed=changed)
+
+    # Active watchers
+    async def set_watcher_active(self, watcher_id: str) -> None:
+        self.store.heartbeats[watcher_id] = datetime.now().timestamp()
+
+    async def is_watcher_stale(self, watcher_id: str, timeout: float = 5) -> bool:
+        last_active = self.store.heartbeats.get(watcher_id)
+        if last_active is None:
+            return True
+        return (datetime.now().timestamp() - last_active) > timeout
+
+    async def stale_watcher_ids(self, timeout: float = 5) -> list[str]:
+        expire_before = datetime.now().timestamp() - timeout
+        return [
+            watcher_id
+            for watcher_id, last_active in self.store.heartbeats.items()
+            if last_active < expire_before
+        ]
+
+    async def remove_watcher_active_key(self, watcher_id: str) -> None:
+        self.store.heartbeats.pop(watcher_id, None)
+
+    async def oldest_watcher_active(self) -> float | None:
+        return min(self.store.heartbeats.values(), default=None)
+
+    # State
+    async def state(self) -> ChannelState:
+        return self.store.state
+
+    # Projection
+    async def set_current_projection(self, new_value: Projection | None) -> None:
+        store = self.store
+        store.state = replace(store.state, projection=new_value)
+
+    async def _reset_state(self) -> None:
+        self.store.state = ChannelState()
+
+    # Channel status
+    async def translate_status(
+        self, target: ChannelStatus, position: timedelta | None = None
+    ) -> StateTransition:
+        store = self.store
+        async with store.lock:
+            now = get_epoch_microseconds()
+            previous = store.state
+            if position is not None:
+                store.state = replace(
+                    previous,
+                    play_status=replace(
+                        previous.play_status,
+                        anchor_position=get_total_microseconds(position),
+                        anchor_at=now,
+                    ),
+                )
+            self._translate(store, target, now)
+            return _transition(previous, store.state)
+
+    async def request_play(self) -> StateTransition:
+        store = self.store
+        async with store.lock:
+            previous = store.state
+            if previous.status == ChannelStatus.PAUSED:
+                self._evaluate_to_play(store, get_epoch_microseconds())
+            return _transition(previous, store.state)
+
+    async def resume_if_all_ready(self) -> StateTransition:
+        store = self.store
+        async with store.lock:
+            previous = store.state
+            if previous.status == ChannelStatus.PENDING and store.is_all_watchers_ready:
+                self._translate(store, ChannelStatus.PLAYING, get_epoch_microseconds())
+            return _transition(previous, store.state)
+
+    @staticmethod
+    def _translate(store: _ChannelStore, target: ChannelStatus, now: int) -> None:
+        state = store.state
+        if (state.status, target) not in _RULES:
+            return
+
+        play_status = state.play_status
+        rate = _RULES[state.status, target]
+        if rate is not None and rate != play_status.rate:
+            play_status = PlayStatus(play_status.position_at(now), now, rate)
+        store.state = replace(state, status=target, play_status=play_status)
+
+    def _evaluate_to_play(self, store: _ChannelStore, now: int) -> None:
+        if store.is_all_watchers_ready:
+            self._translate(store, ChannelStatus.PLAYING, now)
+        else:
+            self._translate(store, ChannelStatus.PENDING, now)
+
+    # Play status
+    async def reset_playback(self, position: timedelta = timedelta(0)) -> None:
+        store = self.store
+        store.state = replace(
+            store.state,
+            status=ChannelStatus.PAUSED,
+            play_status=PlayStatus.paused_at(position),
+        )
+
+    async def set_position(self, position: timedelta) -> None:
+        store = self.store
+        play_status = replace(
+            store.state.play_status,
+            anchor_position=get_total_microseconds(position),
+            anchor_at=get_epoch_microseconds(),
+        )
+        store.state = replace(store.state, play_status=play_status)
+
+    # Watch progress
+    async def save_progress(self, record_id: str, position: timedelta) -> None:
+        store = self.store
+        async with store.lock:
+            store.progresses[record_id] = position
+            store.progresses.move_to_end(record_id)
+            store.dirty_progresses.add(record_id)
+
+            # Evict least recently updated progresses over the limit
+            while len(store.progresses) > settings.WATCH_PROGRESS_LIMIT:
+                evicted, _ = store.progresses.popitem(last=False)
+                store.dirty_progresses.discard(evicted)
+
+    async def get_progress(self, record_id: str) -> timedelta | None:
+        return self.store.progresses.get(record_id)
+
+    async def pop_dirty_progresses(self) -> dict[str, timedelta]:
+        store = self.store
+        async with store.lock:
+            progresses = {
+                record_id: store.progresses[record_id]
+                for record_id in store.dirty_progresses
+                if record_id in store.progresses
+            }
+            store.dirty_progresses.clear()
+            return progresses
+
+    # Call
+    async def init_call_pending_ids(self, call_id: str) -> bool:
+        store = self.store
+        watcher_ids = store.watchers.keys() - {call_id}
+        if not watcher_ids:
+            return False
+
+        store.call_pending_ids |= watcher_ids
+        return True
+
+    async def remove_call_pending_id(self, response_id: str) -> None:
+        self.store.call_pending_ids.discard(response_id)
+
+    async def clear_call_pending_ids(self) -> None:
+        self.store.call_pending_ids.clear()
+
+    async def has_pending_call(self) -> bool:
+        return bool(self.store.call_pending_ids)
+
+    async def add_talking_id(self, user_id: str) -> None:
+        self.store.talking_ids.add(user_id)
+
+    async def remove_talking_id(self, user_id: str) -> None:
+        self.store.talking_ids.discard(user_id)
+
+    async def talking_ids(self) -> set[str]:
+        return set(self.store.talking_ids)
+
+    async def is_talking(self) -> bool:
+        store = self.store
+        store.talking_ids &= store.watchers.keys()
+        return bool(store.talking_ids)
+
+    # Published status
+    async def publish_status(self, body: str) -> PublishedStatus:
+        store = self.store
+        if store.status_body == body:
+            return PublishedStatus(version=store.status_version, body=body)
+        previous = store.status_body
+        store.status_version += 1
+        store.status_body = body
+        return PublishedStatus(
+            version=store.status_version, body=body, previous=previous, changed=True
+        )
+
+    async def published_status(self) -> PublishedStatus | None:
+        store = self.store
+        if store.status_body is None:
+            return None
+        return PublishedStatus(version=store.status_version, body=store.status_body)
+
+    # Snapshot
+    async def snapshot(self) -> ChannelSnapshot:
+        store = self.store
+        return ChannelSnapshot(
+            watchers=tuple(store.watchers.values()),
+            ready_ids=frozenset(store.ready_ids),
+            talking_ids=frozenset(store.talking_ids),
+            has_pending_call=bool(store.call_pending_ids),
+            projection=store.state.projection,
+            channel_status=store.state.status,
+            play_status=store.state.play_status,
+            last_active=_channels_last_active.get(self.channel_id),
+        )
+
+    # Utils
+    async def reset(self) -> None:
+        await self.clean_projection()
+
+        # Watch progresses and the status version outlive the channel state,
+        # as they do in Redis
+        old_store = _stores.pop(self.channel_id, None)
+        if old_store is not None and (old_store.progresses or old_store.status_version):
+            _stores[self.channel_id] = _ChannelStore(
+                progresses=old_store.progresses,
+                dirty_progresses=old_store.dirty_progresses,
+                status_version=old_store.status_version,
+            )
+
+
+def _transition(previous: ChannelState, current: ChannelState) -> StateTransition:
+    return StateTransition(
+        previous=previous.status,
+        current=current.status,
+        play_status=current.play_status,
+    )
@@ -0,0 +1,475 @@
+# PEP-8
+from dataclasses import asdict
+from datetime import datetime, timedelta
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache as Cache
+from redis import asyncio as aioredis
+
+from utils.datetime import get_epoch_microseconds, get_total_microseconds
+from .. import scripts
+from ..scripts import STATE_LAYOUT_VERSION
+from ..redis_pool import get_redis, get_script, shard_count
+from .base import BaseChannelCache
+from .types import (
+    ChannelSnapshot,
+    ChannelState,
+    ChannelStatus,
+    PlayStatus,
+    Projection,
+    PublishedStatus,
+    StateTransition,
+    UserInfo,
+)
+
+
+class RedisChannelCache(BaseChannelCache):
+    # Last active time of channels, one index per shard
+    channels_key = Cache.make_key("bunga:channels:last_active")
+
+    def __init__(self, channel_id: str):
+        super().__init__(channel_id)
+        self.keys = self.Keys(channel_id)
+
+    @property
+    def redis(self) -> aioredis.Redis:
+        return get_redis(self.channel_id)
+
+    # Channel index
+    async def set_channel_active(self) -> None:
+        await self.redis.hset(self.channels_key, self.channel_id, str(time.time()))
+
+    async def channel_last_active(self) -> float | None:
+        raw_last_active = await self.redis.hget(self.channels_key, self.channel_id)
+        try:
+            return float(raw_last_active)
+        except (TypeError, ValueError):
+            return None
+
+    async def remove_channel_active(self) -> None:
+        await self.redis.hdel(self.channels_key, self.channel_id)
+
+    @classmethod
+    def shard_count(cls) -> int:
+        return shard_count()
+
+    @classmethod
+    async def active_channel_ids(cls, shard: int = 0) -> list[str]:
+        return await get_redis(shard=shard).hkeys(cls.channels_key)
+
+    # Presence worker owning the channel
+    async def claim_presence(self, owner: str, ttl: float) -> bool:
+        return bool(
+            await get_script(scripts.CLAIM_LEASE)(
+                keys=[self.keys.presence_owner],
+                args=[owner, int(ttl * 1000)],
+                client=self.redis,
+            )
+        )
+
+    async def release_presence(self, owner: str) -> None:
+        await get_script(scripts.RELEASE_LEASE)(
+            keys=[self.keys.presence_owner], args=[owner], client=self.redis
+        )
+
+    # Message budget of a user, shared by all its connections
+    async def take_token(
+        self, user_id: str, code: str, rate: float, burst: float, max_wait: float
+    ) -> float | None:
+        wait = float(
+            await get_script(scripts.TAKE_TOKEN)(
+                keys=[f"{self.keys.prefix}:rate:{user_id}:{code}"],
+                args=[rate, burst, repr(time.time()), max_wait],
+                client=self.redis,
+            )
+        )
+        return None if wait < 0 else wait
+
+    # Client channel name
+    async def register_client(self, user_id: str, channel_name: str) -> None:
+        await self.redis.hset(self.keys.clients, user_id, channel_name)
+
+    async def unregister_client(self, user_id: str) -> None:
+        await self.redis.hdel(self.keys.clients, user_id)
+
+    async def get_client_name(self, user_id: str) -> str | None:
+        return await self.redis.hget(self.keys.clients, user_id)
+
+    async def has_client(self) -> bool:
+        return await self.redis.hlen(self.keys.clients) > 0
+
+    # Watcher info
+    async def watcher_list(self) -> list[UserInfo]:
+        raw_values = await self.redis.hvals(self.keys.watchers)
+        return [UserInfo(**json.loads(v)) for v in raw_values]
+
+    async def watcher_ids(self) -> list[str]:
+        return await self.redis.hkeys(self.keys.watchers)
+
+    async def upsert_watcher(self, new_watcher: UserInfo) -> None:
+        watcher_data = json.dumps(asdict(new_watcher))
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(self.keys.watchers, new_watcher.id, watcher_data)
+        pipe.sadd(self.keys.watcher_ids, new_watcher.id)
+        # A watcher that never sent a heartbeat still goes stale in time
+        pipe.zadd(
+            self.keys.watchers_heartbeat,
+            {new_watcher.id: datetime.now().timestamp()},
+            nx=True,
+        )
+        await pipe.execute()
+
+    async def get_watcher_info(self, user_id: str) -> UserInfo | None:
+        raw_data = await self.redis.hget(self.keys.watchers, user_id)
+        if raw_data is None:
+            return None
+        return UserInfo(**json.loads(raw_data))
+
+    async def remove_watchers(self, user_ids: list[str]) -> list[UserInfo]:
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hmget(self.keys.watchers, user_ids)
+        pipe.hdel(self.keys.watchers, *user_ids)
+        pipe.srem(self.keys.watcher_ids, *user_ids)
+        pipe.zrem(self.keys.watchers_heartbeat, *user_ids)
+        raw_watchers, *_ = await pipe.execute()
+        return [UserInfo(**json.loads(raw)) for raw in raw_watchers if raw]
+
+    async def is_watcher(self, user_id: str) -> bool:
+        return await self.redis.hexists(self.keys.watchers, user_id)
+
+    async def has_watcher(self) -> bool:
+        return await self.redis.hlen(self.keys.watchers) > 0
+
+    # Buffering watchers
+    async def ready_ids(self) -> set[str]:
+        return await self.redis.smembers(self.keys.ready_watchers)
+
+    async def buffering_ids(self) -> set[str]:
+        return await self.redis.sdiff(self.keys.watcher_ids, self.keys.ready_watchers)
+
+    async def reset_all_watchers_to_buffering(self) -> None:
+        await self.redis.delete(self.keys.ready_watchers)
+
+    async def set_watcher_status(
+        self, watcher_id: str, is_pending: bool
+    ) -> StateTransition:
+        return await self._run_state_script(
+            scripts.UPDATE_CLIENT_STATE,
+            self.keys.ready_watchers,
+            self.keys.watcher_ids,
+            args=[watcher_id, "1" if is_pending else "0", get_epoch_microseconds()],
+        )
+
+    # Active watchers
+    async def set_watcher_active(self, watcher_id: str) -> None:
+        await self.redis.zadd(
+            self.keys.watchers_heartbeat,
+            {watcher_id: datetime.now().timestamp()},
+        )
+
+    async def is_watcher_stale(self, watcher_id: str, timeout: float = 5) -> bool:
+        last_active = await self.redis.zscore(self.keys.watchers_heartbeat, watcher_id)
+        if last_active is None:
+            return True
+        return (datetime.now().timestamp() - last_active) > timeout
+
+    async def stale_watcher_ids(self, timeout: float = 5) -> list[str]:
+        return await self.redis.zrangebyscore(
+            self.keys.watchers_heartbeat,
+            "-inf",
+            f"({datetime.now().timestamp() - timeout}",
+        )
+
+    async def remove_watcher_active_key(self, watcher_id: str) -> None:
+        await self.redis.zrem(self.keys.watchers_heartbeat, watcher_id)
+
+    async def oldest_watcher_active(self) -> float | None:
+        oldest = await self.redis.zrange(
+            self.keys.watchers_heartbeat, 0, 0, withscores=True
+        )
+        return oldest[0][1] if oldest else None
+
+    # State
+    async def state(self) -> ChannelState:
+        return ChannelState.from_fields(await self.redis.hgetall(self.keys.state))
+
+    # Projection
+    async def set_current_projection(self, new_value: Projection | None) -> None:
+        key = self.keys.state
+        if new_value is None:
+            await self.redis.hdel(key, *Projection.FIELDS)
+        else:
+            await self.redis.hset(
+                key, mapping={"v": STATE_LAYOUT_VERSION, **new_value.to_fields()}
+            )
+
+    async def _reset_state(self) -> None:
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hdel(self.keys.state, *Projection.FIELDS)
+        pipe.hset(self.keys.state, mapping=ChannelState().to_fields())
+        await pipe.execute()
+
+    # Channel status
+    async def translate_status(
+        self, target: ChannelStatus, position: timedelta | None = None
+    ) -> StateTransition:
+        return await self._run_state_script(
+            scripts.TRANSLATE,
+            args=[
+                target.value,
+                get_epoch_microseconds(),
+                "" if position is None else get_total_microseconds(position),
+            ],
+        )
+
+    async def request_play(self) -> StateTransition:
+        return await self._run_state_script(
+            scripts.REQUEST_PLAY,
+            self.keys.ready_watchers,
+            self.keys.watcher_ids,
+            args=[get_epoch_microseconds()],
+        )
+
+    async def resume_if_all_ready(self) -> StateTransition:
+        return await self._run_state_script(
+            scripts.RESUME_IF_ALL_READY,
+            self.keys.ready_watchers,
+            self.keys.watcher_ids,
+            args=[get_epoch_microseconds()],
+        )
+
+    async def _run_state_script(
+        self, source: str, *keys: str, args: list
+    ) -> StateTransition:
+        reply = await get_script(source)(
+            keys=[self.keys.state, *keys], args=args, client=self.redis
+        )
+        return StateTransition.from_reply(reply)
+
+    # Play status
+    async def reset_playback(self, position: timedelta = timedelta(0)) -> None:
+        state = ChannelState(play_status=PlayStatus.paused_at(position))
+        await self.redis.hset(self.keys.state, mapping=state.to_fields())
+
+    async def set_position(self, position: timedelta) -> None:
+        await self.redis.hset(
+            self.keys.state,
+            mapping={
+                "anchor_pos": get_total_microseconds(position),
+                "anchor_at": get_epoch_microseconds(),
+            },
+        )
+
+    # Watch progress
+    async def save_progress(self, record_id: str, position: timedelta) -> None:
+        now = datetime.now()
+        data = {"position": position.total_seconds(), "updated_at": now}
+        await get_script(scripts.SAVE_PROGRESS)(
+            keys=[
+                self.keys.watch_progresses,
+                self.keys.watch_progresses_index,
+                self.keys.dirty_progresses,
+            ],
+            args=[
+                record_id,
+                json.dumps(data, default=str),
+                now.timestamp(),
+                settings.WATCH_PROGRESS_LIMIT,
+            ],
+            client=self.redis,
+        )
+
+    async def get_progress(self, record_id: str) -> timedelta | None:
+        key = self.keys.watch_progresses
+
+        raw_data = await self.redis.hget(key, record_id)
+        if raw_data is None:
+            return None
+
+        data = json.loads(raw_data)
+        position_sec = data.get("position")
+        if position_sec is None:
+            return None
+
+        return timedelta(seconds=position_sec)
+
+    async def pop_dirty_progresses(self) -> dict[str, timedelta]:
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.smembers(self.keys.dirty_progresses)
+        pipe.delete(self.keys.dirty_progresses)
+        record_ids, _ = await pipe.execute()
+        if not record_ids:
+            return {}
+
+        record_ids = list(record_ids)
+        raw_values = await self.redis.hmget(self.keys.watch_progresses, record_ids)
+
+        progresses = {}
+        for record_id, raw_data in zip(record_ids, raw_values):
+            if raw_data is None:
+                continue
+            position_sec = json.loads(raw_data).get("position")
+            if position_sec is not None:
+                progresses[record_id] = timedelta(seconds=position_sec)
+        return progresses
+
+    # Call
+    async def init_call_pending_ids(self, call_id: str) -> bool:
+        watcher_ids = await self.watcher_ids()
+        watcher_ids.remove(call_id)
+        if not watcher_ids:
+            return False
+
+        await self.redis.sadd(self.keys.call_pending_ids, *watcher_ids)
+        return True
+
+    async def remove_call_pending_id(self, response_id: str) -> None:
+        await self.redis.srem(self.keys.call_pending_ids, response_id)
+
+    async def clear_call_pending_ids(self) -> None:
+        await self.redis.delete(self.keys.call_pending_ids)
+
+    async def has_pending_call(self) -> bool:
+        return await self.redis.scard(self.keys.call_pending_ids) > 0
+
+    async def add_talking_id(self, user_id: str) -> None:
+        await self.redis.sadd(self.keys.talking_ids, user_id)
+
+    async def remove_talking_id(self, user_id: str) -> None:
+        await self.redis.srem(self.keys.talking_ids, user_id)
+
+    async def talking_ids(self) -> set[str]:
+        return await self.redis.smembers(self.keys.talking_ids)
+
+    async def is_talking(self) -> bool:
+        return (
+            await self.redis.sinterstore(
+                self.keys.talking_ids, [self.keys.talking_ids, self.keys.watcher_ids]
+            )
+            > 0
+        )
+
+    # Published status
+    async def publish_status(self, body: str) -> PublishedStatus:
+        reply = await get_script(scripts.PUBLISH_STATUS)(
+            keys=[self.keys.published_status], args=[body], client=self.redis
+        )
+        if len(reply) == 1:
+            return PublishedStatus(version=int(reply[0]), body=body)
+        version, previous = reply
+        return PublishedStatus(
+            version=int(version), body=body, previous=previous or None, changed=True
+        )
+
+    async def published_status(self) -> PublishedStatus | None:
+        version, body = await self.redis.hmget(
+            self.keys.published_status, "version", "body"
+        )
+        if body is None:
+            return None
+        return PublishedStatus(version=int(version), body=body)
+
+    # Snapshot
+    async def snapshot(self) -> ChannelSnapshot:
+        """Read all per-channel state in one pipelined round trip."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hvals(self.keys.watchers)
+        pipe.smembers(self.keys.ready_watchers)
+        pipe.smembers(self.keys.talking_ids)
+        pipe.scard(self.keys.call_pending_ids)
+        pipe.hgetall(self.keys.state)
+        pipe.hget(self.channels_key, self.channel_id)
+
+        (
+            raw_watchers,
+            ready_ids,
+            talking_ids,
+            pending_count,
+            raw_state,
+            raw_last_active,
+        ) = await pipe.execute()
+        state = ChannelState.from_fields(raw_state)
+
+        return ChannelSnapshot(
+            watchers=tuple(UserInfo(**json.loads(v)) for v in raw_watchers),
+            ready_ids=frozenset(ready_ids),
+            talking_ids=frozenset(talking_ids),
+            has_pending_call=pending_count > 0,
+            projection=state.projection,
+            channel_status=state.status,
+            play_status=state.play_status,
+            last_active=float(raw_last_active) if raw_last_active else None,
+        )
+
+    # Utils
+    async def reset(self) -> None:
+        await self.clean_projection()
+        await self.redis.delete(
+            self.keys.clients,
+            self.keys.watchers,
+            self.keys.watcher_ids,
+            self.keys.watchers_heartbeat,
+            self.keys.ready_watchers,
+            self.keys.call_pending_ids,
+            self.keys.talking_ids,
+            self.keys.state,
+            self.keys.presence_owner,
+        )
+        # Keep the version, clients may still hold an older one
+        await self.redis.hdel(self.keys.published_status, "body")
+
+    class Keys:
+        """Redis keys of a channel, formatted once per channel.
+
+        With CHANNEL_KEY_HASH_TAG the channel id is wrapped in a hash tag,
+        so all keys of a channel land in the same cluster slot.
+        """
+
+        __slots__ = (
+            "channel_id",
+            "prefix",
+            "clients",
+            "watchers",
+            "ready_watchers",
+            "watcher_ids",
+            "watchers_heartbeat",
+            "state",
+            "watch_progresses",
+            "watch_progresses_index",
+            "dirty_progresses",
+            "call_pending_ids",
+            "talking_ids",
+            "presence_owner",
+            "published_status",
+        )
+
+        def __init__(self, channel_id: str):
+            self.channel_id = channel_id
+            self.prefix = prefix = self.format_prefix(channel_id)
+
+            self.clients = f"{prefix}:clients"
+            self.watchers = f"{prefix}:watchers"
+            self.ready_watchers = f"{prefix}:ready_watchers"
+            self.watcher_ids = f"{prefix}:watcher_ids"
+            self.watchers_heartbeat = f"{prefix}:watchers_heartbeat"
+            self.state = f"{prefix}:state"
+            self.watch_progresses = f"{prefix}:watch_progresses"
+            self.watch_progresses_index = f"{prefix}:watch_progresses_index"
+            self.dirty_progresses = f"{prefix}:dirty_progresses"
+            self.call_pending_ids = f"{prefix}:call_pending_ids"
+            self.talking_ids = f"{prefix}:talking_ids"
+            self.presence_owner = f"{prefix}:presence_owner"
+            self.published_status = f"{prefix}:published_status"
+
+        @staticmethod
+        def format_prefix(channel_id: str) -> str:
+            if settings.CHANNEL_KEY_HASH_TAG:
+                channel_id = f"{{{channel_id}}}"
+            return f"{settings.CHANNEL_KEY_PREFIX}:{channel_id}"
+
+        @classmethod
+        def pattern(cls, name: str) -> str:
+            """Match pattern of one key across all channels."""
+            return f"{cls.format_prefix('*')}:{name}"
@@ -0,0 +1,242 @@
+# PEP-8
+from dataclasses import dataclass, field
+from datetime import timedelta
+from enum import Enum
+from typing import ClassVar, Self
+
+from utils.datetime import get_epoch_microseconds, get_total_microseconds
+from ..scripts import STATE_LAYOUT_VERSION
+
+
+@dataclass(frozen=True)
+class UserInfo:
+    id: str
+    name: str
+    color_hue: int = 0
+
+    server: ClassVar[Self]
+
+
+UserInfo.server = UserInfo(id="server", name="server")
+
+
+@dataclass
+class VideoRecord:
+    record_id: str
+    title: str
+    source: str
+    path: str
+    thumb_url: str | None = None
+
+
+@dataclass
+class Projection:
+    record: VideoRecord
+    sharer: UserInfo
+
+    FIELDS: ClassVar[tuple[str, ...]] = (
+        "record_id",
+        "title",
+        "source",
+        "path",
+        "thumb_url",
+        "sharer_id",
+        "sharer_name",
+        "sharer_hue",
+    )
+
+    @classmethod
+    def from_fields(cls, fields: dict[str, str]) -> Projection:
+        return cls(
+            record=VideoRecord(
+                record_id=fields["record_id"],
+                title=fields["title"],
+                source=fields["source"],
+                path=fields["path"],
+                thumb_url=fields["thumb_url"] or None,
+            ),
+            sharer=UserInfo(
+                id=fields["sharer_id"],
+                name=fields["sharer_name"],
+                color_hue=int(fields["sharer_hue"]),
+            ),
+        )
+
+    def to_fields(self) -> dict[str, str | int]:
+        return {
+            "record_id": self.record.record_id,
+            "title": self.record.title,
+            "source": self.record.source,
+            "path": self.record.path,
+            "thumb_url": self.record.thumb_url or "",
+            "sharer_id": self.sharer.id,
+            "sharer_name": self.sharer.name,
+            "sharer_hue": self.sharer.color_hue,
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class PlayStatus:
+    """Playback position as a pure function of time.
+
+    Playback was at ``anchor_position`` µs at epoch time ``anchor_at`` µs and
+    advances at ``rate``, so play, pause and seek only move the anchor, and
+    any reader can compute the current position without a write.
+    """
+
+    anchor_position: int = 0
+    anchor_at: int = 0
+    rate: float = 0.0
+
+    @classmethod
+    def paused_at(cls, position: timedelta) -> PlayStatus:
+        return cls(anchor_position=get_total_microseconds(position))
+
+    @property
+    def playing(self) -> bool:
+        return self.rate != 0
+
+    def position_at(self, now: int) -> int:
+        return self.anchor_position + int((now - self.anchor_at) * self.rate)
+
+    @property
+    def position(self) -> timedelta:
+        return timedelta(microseconds=self.position_at(get_epoch_microseconds()))
+
+    @classmethod
+    def from_fields(cls, anchor_position: str, anchor_at: str, rate: str) -> PlayStatus:
+        return cls(int(anchor_position), int(anchor_at), float(rate))
+
+    def to_fields(self) -> dict[str, int | float]:
+        return {
+            "anchor_pos": self.anchor_position,
+            "anchor_at": self.anchor_at,
+            "rate": self.rate,
+        }
+
+
+class ChannelStatus(str, Enum):
+    PAUSED = "paused"
+    PENDING = "pending"
+    PLAYING = "playing"
+
+
+@dataclass(frozen=True)
+class ChannelState:
+    """Decoded content of the per-channel state hash."""
+
+    status: ChannelStatus = ChannelStatus.PAUSED
+    play_status: PlayStatus = field(default_factory=PlayStatus)
+    projection: Projection | None = None
+
+    @classmethod
+    def from_fields(cls, fields: dict[str, str]) -> ChannelState:
+        if not fields:
+            return cls()
+
+        version = int(fields.get("v", STATE_LAYOUT_VERSION))
+        decoder = _STATE_DECODERS.get(version)
+        if decoder is None:
+            raise ValueError(f"Unknown channel state layout version: {version}")
+        return decoder(fields)
+
+    def to_fields(self) -> dict[str, str | int]:
+        fields: dict[str, str | int] = {
+            "v": STATE_LAYOUT_VERSION,
+            "status": self.status.value,
+            **self.play_status.to_fields(),
+        }
+        if self.projection is not None:
+            fields.update(self.projection.to_fields())
+        return fields
+
+
+def _decode_state_v1(fields: dict[str, str]) -> ChannelState:
+    # Layout 1 kept position and play_at, with play_at 0 while paused
+    fields = dict(fields)
+    play_at = fields.pop("play_at", "0")
+    fields["anchor_pos"] = fields.pop("position", "0")
+    fields["anchor_at"] = play_at
+    fields["rate"] = "1" if int(play_at) else "0"
+    return _decode_state_v2(fields)
+
+
+def _decode_state_v2(fields: dict[str, str]) -> ChannelState:
+    try:
+        status = ChannelStatus(fields.get("status", ChannelStatus.PAUSED))
+    except ValueError:
+        status = ChannelStatus.PAUSED
+
+    return ChannelState(
+        status=status,
+        play_status=PlayStatus.from_fields(
+            fields.get("anchor_pos", "0"),
+            fields.get("anchor_at", "0"),
+            fields.get("rate", "0"),
+        ),
+        projection=(
+            Projection.from_fields(fields) if fields.get("record_id") else None
+        ),
+    )
+
+
+_STATE_DECODERS = {1: _decode_state_v1, 2: _decode_state_v2}
+
+
+@dataclass(frozen=True)
+class StateTransition:
+    previous: ChannelStatus
+    current: ChannelStatus
+    play_status: PlayStatus
+    # Whether the watcher's readiness changed, for watcher status updates
+    ready_changed: bool = False
+
+    @property
+    def changed(self) -> bool:
+        return self.previous != self.current
+
+    @classmethod
+    def from_reply(cls, reply: list[str]) -> StateTransition:
+        previous, current, *play_status = reply[:5]
+        return cls(
+            previous=ChannelStatus(previous),
+            current=ChannelStatus(current),
+            play_status=PlayStatus.from_fields(*play_status),
+            ready_changed=reply[5:6] == ["1"],
+        )
+
+
+@dataclass(frozen=True)
+class PublishedStatus:
+    """Channel status last broadcast, as JSON, with its version."""
+
+    version: int
+    body: str
+    # Body of the version before, when publishing bumped the version
+    previous: str | None = None
+    changed: bool = False
+
+
+@dataclass(frozen=True)
+class ChannelSnapshot:
+    watchers: tuple[UserInfo, ...]
+    ready_ids: frozenset[str]
+    talking_ids: frozenset[str]
+    has_pending_call: bool
+    projection: Projection | None
+    channel_status: ChannelStatus
+    play_status: PlayStatus
+    # Time of the last client message in the channel
+    last_active: float | None = None
+
+    @property
+    def watcher_ids(self) -> list[str]:
+        return [w.id for w in self.watchers]
+
+    @property
+    def buffering_ids(self) -> list[str]:
+        return [w.id for w in self.watchers if w.id not in self.ready_ids]
+
+    @property
+    def is_all_watchers_ready(self) -> bool:
+        return len(self.buffering_ids) == 0
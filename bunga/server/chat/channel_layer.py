@@ -0,0 +1,176 @@
+# PEP-8
+
+from collections import Counter
+import asyncio
+
+from channels_redis.core import RedisChannelLayer
+from redis.asyncio.client import PubSub
+from redis.exceptions import ConnectionError
+
+from utils.log import logger
+
+
+class RoomFanoutChannelLayer(RedisChannelLayer):
+    """Redis channel layer sending group messages once per process.
+
+    Group members living in this process are kept in memory, and the
+    process subscribes to a pub/sub channel of the group while it has any.
+    group_send delivers to local members directly and publishes the message
+    once, every other process fans it out to its own members, so a message
+    costs one Redis write however many members the group has.
+
+    Only process-local channels, the ones consumers get, can join groups.
+
+    channels_redis lets one receiving consumer at a time pop Redis for the
+    whole process, and that one does not watch its own buffer meanwhile.
+    Local deliveries wake it, so it does not wait for a Redis message.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # Group -> local member channels
+        self._members: dict[str, set[str]] = {}
+        # Host index -> subscription and its reader task, in the loop of
+        # the local members
+        self._pubsubs: dict[int, PubSub] = {}
+        self._readers: dict[int, asyncio.Task] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        # Process-local channels being received on, and a wake-up of the
+        # one popping Redis for them
+        self._receiving: Counter[str] = Counter()
+        self._delivered = asyncio.Event()
+
+    async def group_add(self, group: str, channel: str) -> None:
+        assert self.require_valid_group_name(group), "Group name not valid"
+        assert self.require_valid_channel_name(channel), "Channel name not valid"
+        assert "!" in channel, "Only process-local channels can join groups"
+
+        members = self._members.get(group)
+        if members is None:
+            members = self._members[group] = set()
+            await self._subscribe(group)
+        members.add(channel)
+
+    async def group_discard(self, group: str, channel: str) -> None:
+        assert self.require_valid_group_name(group), "Group name not valid"
+        assert self.require_valid_channel_name(channel), "Channel name not valid"
+
+        members = self._members.get(group)
+        if members is None:
+            return
+        members.discard(channel)
+        if not members:
+            del self._members[group]
+            await self._pubsub(self.consistent_hash(group)).unsubscribe(
+                self._fanout_key(group)
+            )
+
+    async def group_send(self, group: str, message: dict) -> None:
+        assert self.require_valid_group_name(group), "Group name not valid"
+
+        # From another loop, e.g. async_to_sync in a view, local members are
+        # reached through the subscription like remote ones
+        origin = ""
+        if asyncio.get_running_loop() is self._loop:
+            origin = self.client_prefix
+            self._deliver(group, message)
+
+        index = self.consistent_hash(group)
+        await self.connection(index).publish(
+            self._fanout_key(group),
+            self.serialize({"origin": origin, "message": message}),
+        )
+
+    def _deliver(self, group: str, message: dict) -> None:
+        for channel in self._members.get(group, ()):
+            self.receive_buffer[channel].put_nowait(message)
+        self._delivered.set()
+
+    async def receive(self, channel: str) -> dict:
+        if "!" not in channel:
+            return await super().receive(channel)
+
+        self._receiving[channel] += 1
+        try:
+            return await super().receive(channel)
+        finally:
+            self._receiving[channel] -= 1
+            if not self._receiving[channel]:
+                del self._receiving[channel]
+
+    async def receive_single(self, channel: str) -> tuple:
+        if "!" not in channel:
+            return await super().receive_single(channel)
+
+        # Called holding the receive lock, by a consumer which may have a
+        # local message already. Nothing to buffer then, its receive loop
+        # finds the message.
+        self._delivered.clear()
+        if self._has_local_message():
+            return [], None
+
+        pop = asyncio.ensure_future(super().receive_single(channel))
+        delivered = asyncio.ensure_future(self._delivered.wait())
+        try:
+            await asyncio.wait((pop, delivered), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            delivered.cancel()
+            # A message popped meanwhile stays in the backup queue, as on any
+            # cancelled receive, and is popped again next time
+            pop.cancel()
+        try:
+            return await pop
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise
+            return [], None
+
+    def _has_local_message(self) -> bool:
+        return any(
+            not buffer.empty()
+            for channel in self._receiving
+            if (buffer := self.receive_buffer.get(channel)) is not None
+        )
+
+    def _fanout_key(self, group: str) -> str:
+        return f"{self.prefix}:fanout:{group}"
+
+    def _pubsub(self, index: int) -> PubSub:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Subscriptions of a closed loop are gone with it
+            self._loop = loop
+            self._pubsubs.clear()
+            self._readers.clear()
+
+        pubsub = self._pubsubs.get(index)
+        if pubsub is None:
+            pubsub = self._pubsubs[index] = self.connection(index).pubsub()
+        return pubsub
+
+    async def _subscribe(self, group: str) -> None:
+        index = self.consistent_hash(group)
+        pubsub = self._pubsub(index)
+        await pubsub.subscribe(self._fanout_key(group))
+
+        # The reader stops once nothing is subscribed
+        reader = self._readers.get(index)
+        if reader is None or reader.done():
+            self._readers[index] = asyncio.create_task(self._read(pubsub))
+
+    async def _read(self, pubsub: PubSub) -> None:
+        prefix_length = len(self._fanout_key(""))
+        while pubsub.subscribed:
+            try:
+                async for event in pubsub.listen():
+                    if event["type"] != "message":
+                        continue
+                    payload = self.deserialize(event["data"])
+                    if payload["origin"] == self.client_prefix:
+                        continue
+                    group = event["channel"].decode()[prefix_length:]
+                    self._deliver(group, payload["message"])
+            except ConnectionError:
+                # The subscription is restored on reconnect
+                logger.warning("Room fanout subscription lost, retrying")
+                await asyncio.sleep(1)
@@ -1,47 +1,61 @@
 # PEP-8
 
+import asyncio
 import time
 
-from django.core.cache import cache as Cache, caches as Caches
-
 from utils.log import logger
 from .channel_cache import ChannelCache
+from .multition_meta import MultitonMeta
 
 
 class ChannelManager:
-    _stale_seconds = 5 * 60
-    _channels_key = Cache.make_key("bunga:channels:last_active")
+    """Tracks active channels, in one index per cache shard.
 
-    @property
-    def redis(self):
-        cache_backend = Caches["raw_redis"]
-        client = getattr(cache_backend, "_cache")
-        return client.get_client()
+    Each index lives on the shard holding its channels, so shards can be
+    scanned independently.
+    """
+
+    _stale_seconds = 5 * 60
 
-    def set_active(self, channel_id: str) -> None:
-        self.redis.hset(self._channels_key, channel_id, str(time.time()))
+    async def set_active(self, channel_id: str) -> None:
+        await ChannelCache(channel_id).set_channel_active()
 
-    def clean_if_stale(self, channel_id: str) -> bool:
+    async def clean_if_stale(self, channel_id: str) -> bool:
         channel_cache = ChannelCache(channel_id)
         try:
-            if channel_cache.has_client:
+            if await channel_cache.has_client():
                 return False
 
-            raw_last_active = self.redis.hget(self._channels_key, channel_id)
-            last_active = float(raw_last_active)
+            last_active = await channel_cache.channel_last_active()
             if (time.time() - last_active) <= self._stale_seconds:
                 return False
 
             raise Exception("staled")
         except:
             logger.info(f"Clean staled channel {channel_id}")
-            self.redis.hdel(self._channels_key, channel_id)
-            channel_cache.reset()
+            await channel_cache.remove_channel_active()
+            await channel_cache.reset()
+            MultitonMeta.release(channel_id)
             return True
 
-    @property
-    def channels(self) -> list[str]:
-        return self.redis.hkeys(self._channels_key)
+    async def expires_at(self, channel_id: str) -> float | None:
+        """Time the channel goes stale if no client is connected."""
+        last_active = await ChannelCache(channel_id).channel_last_active()
+        if last_active is None:
+            return None
+        return last_active + self._stale_seconds
+
+    def shard_count(self) -> int:
+        return ChannelCache.shard_count()
+
+    async def shard_channels(self, shard: int) -> list[str]:
+        return await ChannelCache.active_channel_ids(shard)
+
+    async def channels(self) -> list[str]:
+        shards = await asyncio.gather(
+            *(self.shard_channels(shard) for shard in range(self.shard_count()))
+        )
+        return [channel_id for channel_ids in shards for channel_id in channel_ids]
 
 
 channel_manager = ChannelManager()
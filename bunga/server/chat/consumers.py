@@ -1,52 +1,111 @@
 # PEP-8
 
-import json
 from dataclasses import asdict
 from typing import Any
+import asyncio
+import time
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 
+from bunga.workers import wake_presence
 from server.models import Channel
 from utils.log import logger
+from utils.token_bucket import TokenBucket
 from .services import ChatService
-from .channel_cache import ChannelCache
+from .channel_cache import ChannelCache, UserInfo
 from .channel_manager import channel_manager
+from .metrics import metrics
+from .outbound_queue import OutboundQueue, QueueOverflow
+from .reaction_batcher import REACTION_CODES, ReactionBatcher
+from .protocol import (
+    MSGPACK_SUBPROTOCOL,
+    RESYNC_CLOSE_CODE,
+    BinaryFrameEncoder,
+    decode_binary_frame,
+    hello_frame,
+)
+from .utils import frame_event, packed_frame_data
 
 
 User = get_user_model()
 
-IgnoreLoggingCode = {"spark", "client-status", "channel-status"}
+IgnoreLoggingCode = {
+    "spark",
+    "client-status",
+    "channel-status",
+    "channel-status-delta",
+    "sync-status",
+    "reactions",
+}
 
 
 class ChatConsumer(AsyncJsonWebsocketConsumer):
     async def connect(self):
-        await self.accept()
-
-        # Start server heartbeat
-        await self.channel_layer.send("presence_worker", {"type": "start_heartbeat"})
+        # Binary frames if the client offers them, JSON text otherwise
+        self.frame_encoder: BinaryFrameEncoder | None = None
+        if MSGPACK_SUBPROTOCOL in self.scope.get("subprotocols", ()):
+            self.frame_encoder = BinaryFrameEncoder()
+            await self.accept(subprotocol=MSGPACK_SUBPROTOCOL)
+            await self.send(bytes_data=hello_frame())
+        else:
+            await self.accept()
+
+        # Messages are written by their own task, so a slow client does not
+        # hold up the channel layer
+        self.outbox = OutboundQueue(settings.OUTBOUND_QUEUE_SIZE)
+        self.writer = asyncio.create_task(self._write_outbox())
 
         self.user_id: str = self.scope["user"].username  # type: ignore
         self.channel: Channel = self.scope["channel"]  # type: ignore
 
         self.channel_cache = ChannelCache(self.channel.channel_id)
-        self.channel_cache.register_client(self.user_id, self.channel_name)
+        await self.channel_cache.register_client(self.user_id, self.channel_name)
+
+        # Watcher info of this user, held from join-in until the user leaves
+        self.user_info: UserInfo | None = None
+        self.reaction_batches = False
+        self.buckets: dict[str, TokenBucket] = {}
+        self.last_touch = -float("inf")
 
         self.service = ChatService(self.channel.channel_id)
 
         self.room_group_name = f"room_{self.channel.channel_id}"
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
 
+        # Start server heartbeat of this channel, once the client is known
+        await wake_presence(self.channel.channel_id)
+
     async def disconnect(self, code):
+        writer = getattr(self, "writer", None)
+        if writer is not None:
+            writer.cancel()
+
         room_group_name = getattr(self, "room_group_name", None)
         if room_group_name is not None:
             await self.channel_layer.group_discard(room_group_name, self.channel_name)
 
-        self.channel_cache.unregister_client(self.user_id)
+        await self.channel_cache.unregister_client(self.user_id)
+        await wake_presence(self.channel.channel_id)
+
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        if bytes_data is not None and self.frame_encoder is not None:
+            await self.receive_json(decode_binary_frame(bytes_data), **kwargs)
+        else:
+            await super().receive(text_data, bytes_data, **kwargs)
 
     async def receive_json(self, content: dict, **kwargs):
-        channel_manager.set_active(self.channel.channel_id)
         code = content.pop("code", None)
+        if not await self._admit(code):
+            return
+
+        await self._touch()
+        try:
+            await metrics.maybe_publish()
+        except Exception:
+            # Best effort, the client is served either way
+            logger.exception("Publishing metrics failed")
         if code not in IgnoreLoggingCode:
             logger.info("Received %s data from %s: %s", code, self.user_id, content)
 
@@ -59,45 +118,118 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
             "pause",
             "seek",
         }
-        if code in FORWARDING_CODES:
-            sender = self.channel_cache.get_watcher_info(self.user_id)
-            if sender:
-                event = {
-                    "type": "message.received",
-                    "code": code,
-                    "sender": asdict(sender),
-                    "data": content,
-                }
+        if code in FORWARDING_CODES and self.user_info is None:
+            # Reconnected while still a watcher, without joining in again
+            self.user_info = await self.channel_cache.get_watcher_info(self.user_id)
+        if code in FORWARDING_CODES and self.user_info is not None:
+            sender = asdict(self.user_info)
+            if code in REACTION_CODES and settings.REACTION_BATCH_WINDOW > 0:
+                ReactionBatcher(self.channel.channel_id).add(code, sender, content)
+            else:
+                event = frame_event(code, sender, content)
                 await self.channel_layer.group_send(self.room_group_name, event)
 
-        await self.service.dispatch(code, self.user_id, content)
+        changed = await self.service.dispatch(
+            code, self.user_id, content, self.user_info
+        )
+        if code == "join-in":
+            self.user_info = await self.channel_cache.get_watcher_info(self.user_id)
+            self.reaction_batches = content.get("reaction_batches") is True
+        # Channel status is sent at once after a change
+        if changed:
+            await wake_presence(self.channel.channel_id)
+
+    async def _admit(self, code: str | None) -> bool:
+        """Take a token for the message; False if the message is over the
+        budget and dropped. Never waits, that would hold up the events this
+        consumer sends too."""
+        name = code if code in settings.RATE_LIMITS else "*"
+        rate, burst = settings.RATE_LIMITS[name]
+
+        bucket = self.buckets.get(name)
+        if bucket is None:
+            bucket = self.buckets[name] = TokenBucket(rate, burst)
+        admitted = bucket.take() is not None
+        if admitted and settings.RATE_LIMIT_SHARED:
+            admitted = (
+                await self.channel_cache.take_token(self.user_id, name, rate, burst, 0)
+                is not None
+            )
+            if not admitted:
+                bucket.refund()
+
+        if not admitted:
+            metrics.incr(f"rate_limit_dropped:{name}")
+        return admitted
+
+    async def _touch(self) -> None:
+        # Heartbeats of a user are written at most every WATCHER_TOUCH_INTERVAL
+        now = time.monotonic()
+        if now - self.last_touch < settings.WATCHER_TOUCH_INTERVAL:
+            return
+        self.last_touch = now
+        await channel_manager.set_active(self.channel.channel_id)
+        await self.channel_cache.set_watcher_active(self.user_id)
+
+    async def watcher_info(self, event: dict[str, Any]) -> None:
+        if event["user_id"] == self.user_id:
+            info = event["info"]
+            self.user_info = UserInfo(**info) if info is not None else None
 
-    async def _send_message_to_client(
-        self,
-        code: str,
-        sender: dict,
-        data: dict | None = None,
-        excludes: list[str] | None = None,
-        **kwargs,
-    ):
+    async def message_frame(self, event: dict[str, Any]) -> None:
+        excludes = event.get("excludes")
         if excludes and self.user_id in excludes:
             return
 
+        code = event["code"]
         if code not in IgnoreLoggingCode:
             logger.info(
-                "Sending message to client %s: code=%s, sender=%s, data=%s",
-                self.user_id,
-                code,
-                sender,
-                data,
+                "Sending message to client %s: %s", self.user_id, event["frame"]
             )
 
-        await self.send(
-            text_data=json.dumps(
-                dict(code=code, sender=sender, **(data or {})),
-                ensure_ascii=False,
-            )
-        )
+        try:
+            superseded = self.outbox.put(code, event)
+        except QueueOverflow:
+            metrics.incr("outbound_overflow")
+            logger.warning("Client %s is too slow, closing to resync", self.user_id)
+            self.outbox.close()
+            return
+        if superseded:
+            metrics.incr("outbound_superseded", superseded)
+        metrics.observe("outbound_queue_depth", len(self.outbox))
+
+    async def _write_outbox(self) -> None:
+        try:
+            while (event := await self.outbox.get()) is not None:
+                # Encoded here, senders are interned in the order frames are sent
+                if self.frame_encoder is not None:
+                    await self.send(
+                        bytes_data=self.frame_encoder.encode(
+                            event["code"], event["sender"], packed_frame_data(event)
+                        )
+                    )
+                else:
+                    await self.send(text_data=event["frame"])
+        except Exception:
+            logger.exception(f"Writing to client {self.user_id} failed")
+            self.outbox.close()
+            await self.close()
+            return
+        await self.close(code=RESYNC_CLOSE_CODE)
+
+    async def message_batch(self, event: dict[str, Any]) -> None:
+        if self.reaction_batches:
+            await self.message_frame(event)
+            return
+
+        for item in event["items"]:
+            for _ in range(item["count"]):
+                await self.message_frame(item)
 
     async def message_received(self, event: dict[str, Any]) -> None:
-        await self._send_message_to_client(**event)
+        # Events of processes not yet sending frames, during a deploy
+        await self.message_frame(
+            frame_event(
+                event["code"], event["sender"], event.get("data"), event.get("excludes")
+            )
+        )
@@ -0,0 +1,97 @@
+# PEP-8
+
+from collections import Counter
+from collections.abc import Callable
+import os
+import socket
+import time
+
+from django.conf import settings
+
+from .redis_pool import get_redis
+
+
+class Metrics:
+    """Gauges and counters of this process.
+
+    They are published to Redis every few seconds, so the monitor API can
+    show all web and worker processes together.
+    """
+
+    _key_prefix = "bunga:metrics:"
+    _publish_interval = 10
+
+    def __init__(self) -> None:
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.counters: Counter[str] = Counter()
+        self.gauges: dict[str, float] = {}
+        # name -> [count, total, max] since the last publish
+        self.summaries: dict[str, list[float]] = {}
+        self._gauge_callbacks: dict[str, Callable[[], float]] = {}
+        self._last_publish = 0.0
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        self.counters[name] += amount
+
+    def set_gauge(self, name: str, value: float) -> None:
+        self.gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        summary = self.summaries.setdefault(name, [0, 0.0, value])
+        summary[0] += 1
+        summary[1] += value
+        summary[2] = max(summary[2], value)
+
+    def register_gauge(self, name: str, callback: Callable[[], float]) -> None:
+        # Evaluated on snapshot, for values owned by another module
+        self._gauge_callbacks[name] = callback
+
+    def snapshot(self) -> dict[str, float]:
+        values: dict[str, float] = dict(self.counters)
+        values.update(self.gauges)
+        for name, callback in self._gauge_callbacks.items():
+            values[name] = callback()
+        for name, (count, total, maximum) in self.summaries.items():
+            values[f"{name}_avg"] = total / count
+            values[f"{name}_max"] = maximum
+        return values
+
+    @property
+    def is_shared(self) -> bool:
+        # The memory cache backend runs in one process with no Redis
+        return settings.CHANNEL_CACHE_BACKEND != "memory"
+
+    async def maybe_publish(self) -> None:
+        if not self.is_shared:
+            return
+
+        now = time.monotonic()
+        if now - self._last_publish < self._publish_interval:
+            return
+        self._last_publish = now
+
+        key = f"{self._key_prefix}{self.name}"
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.delete(key)
+        pipe.hset(key, mapping={"updated_at": time.time(), **self.snapshot()})
+        pipe.expire(key, self._publish_interval * 6)
+        await pipe.execute()
+        self.summaries.clear()
+
+    async def collect(self) -> dict[str, dict[str, float]]:
+        """Latest published metrics of every process."""
+        if not self.is_shared:
+            return {self.name: self.snapshot()}
+
+        redis = get_redis()
+        result = {}
+        async for key in redis.scan_iter(match=f"{self._key_prefix}*"):
+            values = await redis.hgetall(key)
+            if values:
+                result[key.removeprefix(self._key_prefix)] = {
+                    name: float(value) for name, value in values.items()
+                }
+        return result
+
+
+metrics = Metrics()
@@ -1,8 +1,60 @@
+from collections import OrderedDict
+import threading
+import time
+
+from django.conf import settings
+
+from .metrics import metrics
+
+
 class MultitonMeta(type):
-    _instances = {}
+    """One instance per (class, key), kept in a bounded LRU registry.
+
+    Instances unused for MULTITON_TTL_SECONDS, or the least recently used
+    ones beyond MULTITON_MAX_INSTANCES, are dropped and built again on the
+    next call, so memory follows active channels instead of all channels.
+    """
+
+    _instances: OrderedDict[tuple[type, str], tuple[object, float]] = OrderedDict()
+    _lock = threading.Lock()
 
     def __call__(cls, key: str):
         unique_key = (cls, key)
-        if unique_key not in cls._instances:
-            cls._instances[unique_key] = super().__call__(key)
-        return cls._instances[unique_key]
+        now = time.monotonic()
+        with MultitonMeta._lock:
+            entry = MultitonMeta._instances.pop(unique_key, None)
+            if entry is not None:
+                MultitonMeta._instances[unique_key] = (entry[0], now)
+                return entry[0]
+
+        # Built outside the lock, since services build their own multitons
+        instance = super().__call__(key)
+        with MultitonMeta._lock:
+            entry = MultitonMeta._instances.setdefault(unique_key, (instance, now))
+            MultitonMeta._evict(now)
+        return entry[0]
+
+    @staticmethod
+    def _evict(now: float) -> None:
+        instances = MultitonMeta._instances
+        max_count = settings.MULTITON_MAX_INSTANCES
+        expire_before = now - settings.MULTITON_TTL_SECONDS
+        while instances:
+            _, last_used = next(iter(instances.values()))
+            if len(instances) <= max_count and last_used >= expire_before:
+                break
+            instances.popitem(last=False)
+
+    @staticmethod
+    def release(key: str) -> None:
+        """Drop instances of every class for key."""
+        with MultitonMeta._lock:
+            for unique_key in [k for k in MultitonMeta._instances if k[1] == key]:
+                del MultitonMeta._instances[unique_key]
+
+    @staticmethod
+    def instance_count() -> int:
+        return len(MultitonMeta._instances)
+
+
+metrics.register_gauge("multiton_instances", MultitonMeta.instance_count)
@@ -0,0 +1,94 @@
+# PEP-8
+
+from collections import deque
+from typing import Any
+import asyncio
+
+# Codes of messages making pending ones of some codes stale, with those codes
+SUPERSEDES = {"channel-status": {"channel-status", "channel-status-delta"}}
+_REPLACEABLE_CODES = set().union(*SUPERSEDES.values())
+
+
+class QueueOverflow(Exception):
+    pass
+
+
+class OutboundQueue:
+    """Messages of one websocket waiting to be written, in order.
+
+    A message of a code in SUPERSEDES drops the pending ones it makes stale,
+    so a slow client only gets the latest channel status. Other messages are
+    all kept, up to maxsize; after that put raises QueueOverflow, and the
+    client is expected to be closed and resync.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        # [code, event], event set to None once superseded
+        self._entries: deque[list] = deque()
+        # Code -> its pending entries that may be superseded, in order
+        self._replaceable: dict[str, deque[list]] = {}
+        self._size = 0
+        # Superseded entries still in _entries
+        self._tombstones = 0
+        self._ready = asyncio.Event()
+        self.closed = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    def put(self, code: str, event: dict[str, Any]) -> int:
+        """Queue event, return how many pending events it superseded."""
+        if self.closed:
+            return 0
+
+        superseded = 0
+        for stale_code in SUPERSEDES.get(code, ()):
+            for entry in self._replaceable.pop(stale_code, ()):
+                entry[1] = None
+                superseded += 1
+        self._size -= superseded
+        self._tombstones += superseded
+        if self._tombstones > self.maxsize:
+            # Keeps _entries within twice maxsize while the writer is stuck
+            self._entries = deque(e for e in self._entries if e[1] is not None)
+            self._tombstones = 0
+
+        if self._size >= self.maxsize:
+            raise QueueOverflow
+        entry = [code, event]
+        self._entries.append(entry)
+        if code in _REPLACEABLE_CODES:
+            self._replaceable.setdefault(code, deque()).append(entry)
+        self._size += 1
+        self._ready.set()
+        return superseded
+
+    async def get(self) -> dict[str, Any] | None:
+        """Next event to write, or None once the queue is closed."""
+        while True:
+            if self.closed:
+                return None
+            while self._entries:
+                code, event = self._entries.popleft()
+                if event is None:
+                    self._tombstones -= 1
+                    continue
+                self._size -= 1
+                if code in _REPLACEABLE_CODES:
+                    pending = self._replaceable[code]
+                    pending.popleft()
+                    if not pending:
+                        del self._replaceable[code]
+                return event
+            self._ready.clear()
+            await self._ready.wait()
+
+    def close(self) -> None:
+        """Drop pending events, get returns None from now on."""
+        self.closed = True
+        self._entries.clear()
+        self._replaceable.clear()
+        self._size = 0
+        self._tombstones = 0
+        self._ready.set()
@@ -0,0 +1,97 @@
+# PEP-8
+
+from typing import Any
+
+import msgpack
+
+# Binary websocket subprotocol, offered by clients in the handshake. Without
+# it the socket speaks JSON text.
+MSGPACK_SUBPROTOCOL = "bunga.msgpack.v1"
+
+# Close code of a client too slow to keep up with its messages. It missed
+# some, so it should reconnect and join in again for the whole state.
+RESYNC_CLOSE_CODE = 4000
+
+# Message codes, sent as their index in binary frames. Only append, clients
+# get this table in the hello frame but may cache it.
+CODES = (
+    "whats-on",
+    "now-playing",
+    "join-in",
+    "start-projection",
+    "here-are",
+    "client-status",
+    "play",
+    "pause",
+    "seek",
+    "bye",
+    "call",
+    "talk-status",
+    "play-finished",
+    "sync-status",
+    "aloha",
+    "who-are-you",
+    "channel-status",
+    "channel-status-delta",
+    "reset",
+    "popmoji",
+    "danmaku",
+    "spark",
+    "reactions",
+)
+CODE_IDS = {code: index for index, code in enumerate(CODES)}
+
+# msgpack header of a 3 item array
+_FRAME_HEADER = b"\x93"
+
+
+def pack_data(data: dict | None) -> bytes:
+    """Payload of a binary frame, packed once per process."""
+    return msgpack.packb(data)
+
+
+def hello_frame() -> bytes:
+    return msgpack.packb({"codes": CODES})
+
+
+class BinaryFrameEncoder:
+    """Binary frames of one connection, as [code, sender, data].
+
+    code is the index in CODES, or the code itself if unknown. Senders are
+    interned per connection: the first frame of a sender, or one after its
+    info changed, carries [ref, sender info], later ones only ref.
+    """
+
+    def __init__(self) -> None:
+        # Sender id -> (ref, info the client holds)
+        self._senders: dict[str, tuple[int, dict]] = {}
+
+    def encode(self, code: str, sender: dict, packed_data: bytes) -> bytes:
+        return b"".join(
+            (
+                _FRAME_HEADER,
+                msgpack.packb(CODE_IDS.get(code, code)),
+                msgpack.packb(self._sender_ref(sender)),
+                packed_data,
+            )
+        )
+
+    def _sender_ref(self, sender: dict) -> int | list:
+        interned = self._senders.get(sender["id"])
+        if interned is not None and interned[1] == sender:
+            return interned[0]
+
+        ref = interned[0] if interned is not None else len(self._senders)
+        self._senders[sender["id"]] = (ref, sender)
+        return [ref, sender]
+
+
+def decode_binary_frame(bytes_data: bytes) -> dict[str, Any]:
+    """Client message of a binary frame, a map with code as index or name."""
+    content = msgpack.unpackb(bytes_data)
+    if not isinstance(content, dict):
+        raise ValueError("Binary frame is not a map")
+    code = content.get("code")
+    if isinstance(code, int):
+        content["code"] = CODES[code] if 0 <= code < len(CODES) else None
+    return content
@@ -0,0 +1,86 @@
+# PEP-8
+
+from dataclasses import asdict
+import asyncio
+import json
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from utils.log import logger
+from .channel_cache import UserInfo
+from .multition_meta import MultitonMeta
+from .utils import frame_event
+
+# Reactions batched per room, sent as one "reactions" message per window
+REACTION_CODES = {"spark", "popmoji", "danmaku"}
+# Reactions sent again and again, counted instead of repeated in a batch
+COUNTED_CODES = {"popmoji"}
+
+
+class ReactionBatcher(metaclass=MultitonMeta):
+    """Reactions of a room sent by clients of this process.
+
+    The first reaction of a window starts a REACTION_BATCH_WINDOW timer,
+    then the reactions gathered meanwhile go out as one channel layer event.
+    Consumers of clients that opted in write it as a single reactions frame,
+    the others write the reactions one by one.
+    """
+
+    def __init__(self, channel_id: str) -> None:
+        self.channel_id = channel_id
+        # (code, sender id, data) -> [code, sender, data, count]
+        self._items: dict[tuple, list] = {}
+        self._flush_task: asyncio.Task | None = None
+
+    def add(self, code: str, sender: dict, data: dict) -> None:
+        if code in COUNTED_CODES:
+            key = (code, sender["id"], json.dumps(data, sort_keys=True))
+        else:
+            # Kept one by one
+            key = (len(self._items),)
+        item = self._items.get(key)
+        if item is not None:
+            item[3] += 1
+        else:
+            self._items[key] = [code, sender, data, 1]
+
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(settings.REACTION_BATCH_WINDOW)
+        items = list(self._items.values())
+        self._items = {}
+        self._flush_task = None
+
+        if len(items) == 1 and items[0][3] == 1:
+            code, sender, data, _ = items[0]
+            event = frame_event(code, sender, data)
+        else:
+            event = batch_event(items)
+        try:
+            await get_channel_layer().group_send(f"room_{self.channel_id}", event)
+        except Exception:
+            logger.exception(f"Sending reactions of {self.channel_id} failed")
+
+
+def batch_event(items: list[list]) -> dict:
+    batch = [
+        {
+            "code": code,
+            "sender": sender,
+            **data,
+            **({"count": count} if count > 1 else {}),
+        }
+        for code, sender, data, count in items
+    ]
+    return {
+        **frame_event("reactions", asdict(UserInfo.server), {"items": batch}),
+        "type": "message.batch",
+        # Each reaction on its own, for clients without batches
+        "items": [
+            {**frame_event(code, sender, data), "count": count}
+            for code, sender, data, count in items
+        ],
+    }
@@ -0,0 +1,77 @@
+# PEP-8
+
+from functools import cache
+import asyncio
+from weakref import WeakKeyDictionary
+
+from django.conf import settings
+from redis import asyncio as aioredis
+from redis.asyncio.cluster import RedisCluster
+from redis.commands.core import AsyncScript
+
+from utils.hash_ring import HashRing
+
+# Connections of redis.asyncio are bound to the loop they are opened in,
+# so keep one shared client (and its pool) per shard per running event loop.
+_clients: WeakKeyDictionary[
+    asyncio.AbstractEventLoop, list[aioredis.Redis | RedisCluster]
+] = WeakKeyDictionary()
+_scripts: WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, AsyncScript]] = (
+    WeakKeyDictionary()
+)
+
+
+@cache
+def _ring() -> HashRing:
+    return HashRing(settings.CHANNEL_REDIS_SHARDS)
+
+
+def shard_count() -> int:
+    # A cluster routes keys itself, so it counts as one shard here
+    return 1 if settings.REDIS_CLUSTER else len(settings.CHANNEL_REDIS_SHARDS)
+
+
+def shard_of(channel_id: str) -> int:
+    if shard_count() == 1:
+        return 0
+    return _ring().index_of(channel_id)
+
+
+def _connect(url: str) -> aioredis.Redis | RedisCluster:
+    if settings.REDIS_CLUSTER:
+        return RedisCluster.from_url(url, decode_responses=True)
+    pool = aioredis.ConnectionPool.from_url(url, decode_responses=True)
+    return aioredis.Redis(connection_pool=pool)
+
+
+def shard_clients() -> list[aioredis.Redis | RedisCluster]:
+    loop = asyncio.get_running_loop()
+    clients = _clients.get(loop)
+    if clients is None:
+        urls = settings.CHANNEL_REDIS_SHARDS[: shard_count()]
+        clients = [_connect(url) for url in urls]
+        _clients[loop] = clients
+    return clients
+
+
+def get_redis(
+    channel_id: str | None = None, shard: int | None = None
+) -> aioredis.Redis | RedisCluster:
+    """Client of the shard owning channel_id, or of the given shard.
+
+    Without either, the first shard is used for process wide keys.
+    """
+    if shard is None:
+        shard = 0 if channel_id is None else shard_of(channel_id)
+    return shard_clients()[shard]
+
+
+def get_script(source: str) -> AsyncScript:
+    # Scripts are loaded into each shard on first use, see AsyncScript
+    loop = asyncio.get_running_loop()
+    scripts = _scripts.setdefault(loop, {})
+    script = scripts.get(source)
+    if script is None:
+        script = get_redis().register_script(source)
+        scripts[source] = script
+    return script
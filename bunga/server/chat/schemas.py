@@ -1,11 +1,21 @@
 # PEP-8
 
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from datetime import timedelta
 from enum import Enum
+from typing import Any
+import json
 
 from utils.datetime import get_total_microseconds
-from .channel_cache import ChannelCache, ChannelStatus, UserInfo, VideoRecord
+from utils.decoders import compile_decoder
+from .channel_cache import (
+    ChannelCache,
+    ChannelSnapshot,
+    ChannelStatus,
+    PlayStatus,
+    UserInfo,
+    VideoRecord,
+)
 
 
 @dataclass
@@ -18,6 +28,8 @@ class NowPlayingSchema:
 class JoinInSchema:
     user: UserInfo
     my_share: StartProjectionSchema | None = None
+    # Client takes reactions batches instead of one message per reaction
+    reaction_batches: bool = False
 
 
 @dataclass
@@ -26,6 +38,14 @@ class HereAreSchema:
     buffering: list[str]
     talking: list[str]
 
+    @classmethod
+    def from_snapshot(cls, snapshot: ChannelSnapshot) -> HereAreSchema:
+        return cls(
+            watchers=list(snapshot.watchers),
+            buffering=snapshot.buffering_ids,
+            talking=list(snapshot.talking_ids),
+        )
+
 
 @dataclass
 class StartProjectionSchema:
@@ -33,13 +53,15 @@ class StartProjectionSchema:
     position: int = 0
 
     @classmethod
-    def from_channel_cache(cls, cache: ChannelCache) -> StartProjectionSchema | None:
-        current_projection = cache.current_projection
-        if not current_projection:
+    async def from_channel_cache(
+        cls, cache: ChannelCache
+    ) -> StartProjectionSchema | None:
+        state = await cache.state()
+        if not state.projection:
             return None
         return cls(
-            video_record=current_projection.record,
-            position=get_total_microseconds(cache.play_status.position),
+            video_record=state.projection.record,
+            position=get_total_microseconds(state.play_status.position),
         )
 
     @property
@@ -84,17 +106,86 @@ class ChannelStatusSchema:
     ready_ids: list[str]
     position: int
     play_status: ChannelStatus
+    # Lets clients extrapolate the position on their own
+    anchor_position: int = 0
+    anchor_at: int = 0
+    rate: float = 0.0
+    # Bumped on every change, see ChannelStatusDeltaSchema
+    version: int = 0
+
+    # Position moves on its own while playing, so it is not part of the body
+    # compared between versions
+    ANCHOR_FIELDS = ("play_status", "anchor_position", "anchor_at", "rate")
+
+    @classmethod
+    def from_snapshot(cls, snapshot: ChannelSnapshot) -> ChannelStatusSchema:
+        play_status = snapshot.play_status
+        return cls(
+            # Sorted, set order would change the body with nothing changed
+            watcher_ids=sorted(snapshot.watcher_ids),
+            ready_ids=sorted(snapshot.ready_ids),
+            position=get_total_microseconds(play_status.position),
+            play_status=snapshot.channel_status,
+            anchor_position=play_status.anchor_position,
+            anchor_at=play_status.anchor_at,
+            rate=play_status.rate,
+        )
 
     @classmethod
-    def from_channel_cache(cls, cache: ChannelCache) -> ChannelStatusSchema:
-        play_status = cache.play_status
+    def from_body(cls, body: str, version: int) -> ChannelStatusSchema:
+        fields = json.loads(body)
+        fields["play_status"] = ChannelStatus(fields["play_status"])
+        play_status = PlayStatus(
+            fields["anchor_position"], fields["anchor_at"], fields["rate"]
+        )
         return cls(
-            watcher_ids=[w.id for w in cache.watcher_list],
-            ready_ids=list(cache.ready_ids),
+            **fields,
             position=get_total_microseconds(play_status.position),
-            play_status=cache.channel_status,
+            version=version,
         )
 
+    @property
+    def body(self) -> str:
+        fields = asdict(self)
+        del fields["position"], fields["version"]
+        return json.dumps(fields, sort_keys=True, separators=(",", ":"))
+
+
+@dataclass
+class ChannelStatusDeltaSchema:
+    """Fields of channel status changed since base_version.
+
+    Clients whose version is not base_version ask for a full status with
+    sync-status.
+    """
+
+    version: int
+    base_version: int
+    changes: dict[str, Any]
+
+    @classmethod
+    def between(
+        cls, previous: str, current: ChannelStatusSchema
+    ) -> ChannelStatusDeltaSchema:
+        before = json.loads(previous)
+        after = json.loads(current.body)
+        changes = {
+            name: value for name, value in after.items() if before.get(name) != value
+        }
+        if any(name in changes for name in ChannelStatusSchema.ANCHOR_FIELDS):
+            changes["position"] = current.position
+        return cls(
+            version=current.version,
+            base_version=current.version - 1,
+            changes=changes,
+        )
+
+
+@dataclass
+class SyncStatusSchema:
+    # Version the client holds, 0 if none
+    version: int = 0
+
 
 class CallAction(str, Enum):
     CALL = "call"
@@ -132,4 +223,12 @@ PROTOCOL_MAP = {
     "call": CallSchema,
     "talk-status": TalkStatusSchema,
     "play-finished": None,
+    "sync-status": SyncStatusSchema,
+}
+
+# Decoders of incoming messages, built once from the schemas above
+DECODERS = {
+    code: compile_decoder(schema)
+    for code, schema in PROTOCOL_MAP.items()
+    if schema is not None
 }
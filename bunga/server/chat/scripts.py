@@ -0,0 +1,258 @@
+# PEP-8
+
+# Lua scripts run by RedisChannelCache. Each one reads and writes the channel
+# state hash in a single atomic round trip, and replies with
+# {previous_status, status, anchor_pos, anchor_at, rate} so callers can log
+# or broadcast the outcome.
+#
+# KEYS[1] is always the state hash. Numbers are formatted with '%d' before
+# being written, since Lua would otherwise print epoch microseconds in
+# scientific notation.
+
+# Layout version of the state hash, bump it when its fields change and
+# teach ChannelState how to decode the previous one.
+STATE_LAYOUT_VERSION = 2
+
+_LIB = f"local LAYOUT_VERSION = '{STATE_LAYOUT_VERSION}'\n" + """
+local STATE = KEYS[1]
+
+-- (current > target) -> action; missing pairs are not allowed
+local RULES = {
+    ['playing>paused'] = 'pause',
+    ['pending>paused'] = 'pause',
+    ['playing>pending'] = 'pause',
+    ['pending>playing'] = 'play',
+    ['paused>pending'] = 'none',
+    ['paused>playing'] = 'play',
+}
+
+local function load_state()
+    local raw = redis.call(
+        'HMGET', STATE,
+        'v', 'status', 'anchor_pos', 'anchor_at', 'rate', 'position', 'play_at'
+    )
+    local state = { status = raw[2] or 'paused', legacy = raw[1] == '1' }
+    if state.legacy then
+        -- Layout 1 kept position and play_at, with play_at 0 while paused
+        local play_at = tonumber(raw[7]) or 0
+        state.anchor_pos = tonumber(raw[6]) or 0
+        state.anchor_at = play_at
+        state.rate = play_at > 0 and 1 or 0
+    else
+        state.anchor_pos = tonumber(raw[3]) or 0
+        state.anchor_at = tonumber(raw[4]) or 0
+        state.rate = tonumber(raw[5]) or 0
+    end
+    return state
+end
+
+local function save_state(state)
+    if state.legacy then
+        redis.call('HDEL', STATE, 'position', 'play_at')
+    end
+    redis.call(
+        'HSET', STATE,
+        'v', LAYOUT_VERSION,
+        'status', state.status,
+        'anchor_pos', string.format('%d', state.anchor_pos),
+        'anchor_at', string.format('%d', state.anchor_at),
+        'rate', tostring(state.rate)
+    )
+end
+
+local function reply(previous, state)
+    return {
+        previous,
+        state.status,
+        string.format('%d', state.anchor_pos),
+        string.format('%d', state.anchor_at),
+        tostring(state.rate),
+    }
+end
+
+local function position_at(state, now)
+    return state.anchor_pos + math.floor((now - state.anchor_at) * state.rate)
+end
+
+local function set_rate(state, rate, now)
+    if state.rate ~= rate then
+        state.anchor_pos = position_at(state, now)
+        state.anchor_at = now
+        state.rate = rate
+    end
+end
+
+local function set_position(state, position, now)
+    state.anchor_pos = position
+    state.anchor_at = now
+end
+
+local function translate(state, target, now)
+    local action = RULES[state.status .. '>' .. target]
+    if action == nil then
+        return false
+    end
+
+    if action == 'play' then
+        set_rate(state, 1, now)
+    elseif action == 'pause' then
+        set_rate(state, 0, now)
+    end
+    state.status = target
+    return true
+end
+
+-- KEYS[2] is the ready set, KEYS[3] the watcher id set
+local function is_all_watchers_ready()
+    return #redis.call('SDIFF', KEYS[3], KEYS[2]) == 0
+end
+
+local function evaluate_to_play(state, now)
+    if is_all_watchers_ready() then
+        return translate(state, 'playing', now)
+    end
+    return translate(state, 'pending', now)
+end
+"""
+
+# KEYS: state
+# ARGV: target status, now, position ('' to keep current)
+TRANSLATE = _LIB + """
+local now = tonumber(ARGV[2])
+local state = load_state()
+local previous = state.status
+
+local dirty = false
+if ARGV[3] ~= '' then
+    set_position(state, tonumber(ARGV[3]), now)
+    dirty = true
+end
+if translate(state, ARGV[1], now) then
+    dirty = true
+end
+
+if dirty then
+    save_state(state)
+end
+return reply(previous, state)
+"""
+
+# KEYS: state, ready set, watcher id set
+# ARGV: watcher id, is pending ('1' / '0'), now
+# Replies the transition, then whether readiness changed ('1' / '0')
+UPDATE_CLIENT_STATE = _LIB + """
+local changed
+if ARGV[2] == '1' then
+    changed = redis.call('SREM', KEYS[2], ARGV[1])
+else
+    changed = redis.call('SADD', KEYS[2], ARGV[1])
+end
+
+local state = load_state()
+local previous = state.status
+if changed == 1 and (state.status == 'playing' or state.status == 'pending') then
+    if evaluate_to_play(state, tonumber(ARGV[3])) then
+        save_state(state)
+    end
+end
+local result = reply(previous, state)
+table.insert(result, tostring(changed))
+return result
+"""
+
+# KEYS: state, ready set, watcher id set
+# ARGV: now
+REQUEST_PLAY = _LIB + """
+local state = load_state()
+local previous = state.status
+if state.status == 'paused' then
+    if evaluate_to_play(state, tonumber(ARGV[1])) then
+        save_state(state)
+    end
+end
+return reply(previous, state)
+"""
+
+# KEYS: state, ready set, watcher id set
+# ARGV: now
+RESUME_IF_ALL_READY = _LIB + """
+local state = load_state()
+local previous = state.status
+if state.status == 'pending' and is_all_watchers_ready() then
+    if translate(state, 'playing', tonumber(ARGV[1])) then
+        save_state(state)
+    end
+end
+return reply(previous, state)
+"""
+
+# KEYS: progresses hash, progress index zset, dirty progress set
+# ARGV: record id, progress json, updated at, limit of kept progresses
+SAVE_PROGRESS = """
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+redis.call('SADD', KEYS[3], ARGV[1])
+
+-- Evict least recently updated progresses over the limit
+local over = redis.call('ZCARD', KEYS[2]) - tonumber(ARGV[4])
+if over > 0 then
+    local evicted = redis.call('ZRANGE', KEYS[2], 0, over - 1)
+    redis.call('HDEL', KEYS[1], unpack(evicted))
+    redis.call('ZREM', KEYS[2], unpack(evicted))
+    redis.call('SREM', KEYS[3], unpack(evicted))
+end
+return over
+"""
+
+# KEYS: published status
+# ARGV: status body
+# Replies {version} if the body is unchanged, else {version, previous body}
+PUBLISH_STATUS = """
+local previous = redis.call('HGET', KEYS[1], 'body')
+if previous == ARGV[1] then
+    return { tonumber(redis.call('HGET', KEYS[1], 'version')) or 0 }
+end
+local version = redis.call('HINCRBY', KEYS[1], 'version', 1)
+redis.call('HSET', KEYS[1], 'body', ARGV[1])
+return { version, previous or '' }
+"""
+
+# KEYS: token bucket
+# ARGV: rate per second, burst, now in seconds, max wait in seconds
+# Replies the seconds to wait for the reserved token, or -1 if too long
+TAKE_TOKEN = """
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local now, max_wait = tonumber(ARGV[3]), tonumber(ARGV[4])
+local raw = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local tokens = tonumber(raw[1]) or burst
+local at = tonumber(raw[2]) or now
+tokens = math.min(burst, tokens + math.max(now - at, 0) * rate)
+
+local wait = math.max(1 - tokens, 0) / rate
+if wait > max_wait then
+    return '-1'
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - 1), 'at', ARGV[3])
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst + 1) / rate * 1000))
+return tostring(wait)
+"""
+
+# KEYS: lease
+# ARGV: owner, time to live in ms
+CLAIM_LEASE = """
+local owner = redis.call('GET', KEYS[1])
+if owner and owner ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+return 1
+"""
+
+# KEYS: lease
+# ARGV: owner
+RELEASE_LEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
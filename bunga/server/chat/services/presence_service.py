@@ -1,55 +1,75 @@
 # PEP-8
 
+from dataclasses import asdict, dataclass, replace
+import asyncio
+import time
+
+from django.conf import settings
+
 from utils.datetime import get_total_microseconds
 from utils.log import logger
-from ..utils import broadcast_message
-from ..schemas import StartProjectionSchema
+from ..utils import broadcast_event, broadcast_message, send_message
+from ..schemas import (
+    ChannelStatusDeltaSchema,
+    ChannelStatusSchema,
+    StartProjectionSchema,
+)
 from ..multition_meta import MultitonMeta
 from ..channel_cache import (
     ChannelCache,
+    ChannelSnapshot,
     ChannelStatus,
-    PlayStatus,
     Projection,
     UserInfo,
 )
 from .playback_service import ChannelPlaybackService
+from .progress_service import ChannelProgressService
 from .state_service import ChannelStateService
 
 
+@dataclass(frozen=True)
+class PresencePolicy:
+    """Cadence of presence work for a channel, see PRESENCE_POLICIES."""
+
+    status_interval: float
+    stale_seconds: float
+
+
 class ChannelPresenceService(metaclass=MultitonMeta):
     def __init__(self, channel_id: str) -> None:
         self.channel_id = channel_id
         self.state = ChannelStateService(channel_id)
         self.playback = ChannelPlaybackService(channel_id)
+        self.progress = ChannelProgressService(channel_id)
         self.channel_cache = ChannelCache(channel_id)
 
     async def join_user(self, user: UserInfo) -> None:
-        self.channel_cache.upsert_watcher(user)
+        await self.channel_cache.upsert_watcher(user)
+        await self._send_watcher_info(user.id, user)
         await broadcast_message(
             channel_id=self.channel_id, code="aloha", sender=user, excludes=[user.id]
         )
 
-        self.state.translate_to(ChannelStatus.PAUSED)
+        await self.state.translate_to(ChannelStatus.PAUSED)
 
     async def apply_new_projection(
         self, sharer: UserInfo, data: StartProjectionSchema
     ) -> None:
         # Clean old projection
-        self.channel_cache.clean_projection()
+        await self.channel_cache.clean_projection()
 
         # Update projection in cache
-        self.channel_cache.current_projection = Projection(
-            sharer=sharer, record=data.video_record
+        await self.channel_cache.set_current_projection(
+            Projection(sharer=sharer, record=data.video_record)
         )
 
         # Load progress for new projection
-        saved_progress = self.channel_cache.get_progress(data.video_record.record_id)
+        saved_progress = await self.progress.get_progress(data.video_record.record_id)
         if saved_progress is not None:
             data.position = get_total_microseconds(saved_progress)
 
         # Init Status in cache
-        self.channel_cache.play_status = PlayStatus(position=data.position_delta)
-        self.channel_cache.channel_status = ChannelStatus.PAUSED
+        await self.channel_cache.reset_playback(data.position_delta)
 
         # Broadcast new projection
         await broadcast_message(
@@ -59,31 +79,110 @@ class ChannelPresenceService(metaclass=MultitonMeta):
             data=data,
         )
 
-    async def leave_user(self, user_id: str) -> None:
-        self.channel_cache.remove_watcher_active_key(user_id)
+    async def leave_user(self, user_id: str) -> bool:
+        return await self.leave_users([user_id])
 
-        info = self.channel_cache.remove_watcher(user_id)
-        if info is None:
-            return
+    async def leave_users(self, user_ids: list[str]) -> bool:
+        """Remove watchers, return whether any of them was watching."""
+        infos = await self.channel_cache.remove_watchers(user_ids)
+        if not infos:
+            return False
 
-        if self.channel_cache.has_watcher:
-            await broadcast_message(channel_id=self.channel_id, code="bye", sender=info)
-            if (
-                self.channel_cache.channel_status == ChannelStatus.PENDING
-                and self.channel_cache.is_all_watchers_ready
-            ):
-                # If leaving user is the last buffering one, start playback
-                self.state.translate_to(ChannelStatus.PLAYING)
+        await asyncio.gather(*(self._send_watcher_info(info.id) for info in infos))
+
+        if await self.channel_cache.has_watcher():
+            await asyncio.gather(
+                *(
+                    broadcast_message(
+                        channel_id=self.channel_id, code="bye", sender=info
+                    )
+                    for info in infos
+                )
+            )
+            # If leaving users are the last buffering ones, start playback
+            await self.state.resume_if_all_ready()
         else:
             # Pause playback if no watcher left
-            self.state.translate_to(ChannelStatus.PAUSED)
-
-    async def remove_stale_user(self) -> None:
-        stale_ids = [
-            id
-            for id in self.channel_cache.watcher_ids
-            if self.channel_cache.is_watcher_stale(id)
-        ]
-        for id in stale_ids:
-            logger.info(f"Clean staled user {id}")
-            await self.leave_user(id)
+            await self.state.translate_to(ChannelStatus.PAUSED)
+        return True
+
+    async def _send_watcher_info(
+        self, user_id: str, info: UserInfo | None = None
+    ) -> None:
+        # Consumers hold the watcher info of their user, each connection of
+        # the user gets it, None once the user left
+        await broadcast_event(
+            self.channel_id,
+            {
+                "type": "watcher.info",
+                "user_id": user_id,
+                "info": asdict(info) if info is not None else None,
+            },
+        )
+
+    def policy(self, snapshot: ChannelSnapshot) -> PresencePolicy:
+        status = snapshot.channel_status
+        policy = PresencePolicy(**settings.PRESENCE_POLICIES[status.value])
+
+        # A lone watcher has nobody to keep in sync, unless it is buffering
+        alone = len(snapshot.watchers) <= 1 and status != ChannelStatus.PENDING
+        idle = time.time() - (snapshot.last_active or 0) > (
+            settings.PRESENCE_IDLE_SECONDS
+        )
+        if alone or idle:
+            policy = replace(
+                policy,
+                status_interval=policy.status_interval * settings.PRESENCE_IDLE_BACKOFF,
+            )
+        return policy
+
+    async def remove_stale_user(self, stale_seconds: float) -> bool:
+        """Remove watchers silent for stale_seconds, return whether any was."""
+        stale_ids = await self.channel_cache.stale_watcher_ids(stale_seconds)
+        if not stale_ids:
+            return False
+
+        logger.info(f"Clean staled users {', '.join(stale_ids)}")
+        return await self.leave_users(stale_ids)
+
+    async def broadcast_status(
+        self, full: bool = False, snapshot: ChannelSnapshot | None = None
+    ) -> None:
+        """Broadcast what changed in channel status since the last call.
+
+        Nothing is sent if nothing changed, unless full is given. snapshot is
+        the channel state if just read, saving a read.
+        """
+        if snapshot is None:
+            snapshot = await self.channel_cache.snapshot()
+        status = ChannelStatusSchema.from_snapshot(snapshot)
+        published = await self.channel_cache.publish_status(status.body)
+        status.version = published.version
+
+        if not published.changed and not full:
+            return
+        if full or published.previous is None:
+            await broadcast_message(self.channel_id, "channel-status", data=status)
+        else:
+            await broadcast_message(
+                self.channel_id,
+                "channel-status-delta",
+                data=ChannelStatusDeltaSchema.between(published.previous, status),
+            )
+
+    async def send_status(self, receiver_id: str, version: int | None = None) -> None:
+        """Send full channel status to a client not holding its version."""
+        published = await self.channel_cache.published_status()
+        if published is None:
+            # Not broadcast yet, its first broadcast will be a full one
+            status = ChannelStatusSchema.from_snapshot(
+                await self.channel_cache.snapshot()
+            )
+        elif published.version == version:
+            return
+        else:
+            status = ChannelStatusSchema.from_body(published.body, published.version)
+
+        await send_message(
+            self.channel_id, "channel-status", receiver_id=receiver_id, data=status
+        )
@@ -0,0 +1,69 @@
+# PEP-8
+
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+
+from server import models
+from utils.log import logger
+from ..channel_cache import ChannelCache
+from ..multition_meta import MultitonMeta
+
+
+class ChannelProgressService(metaclass=MultitonMeta):
+    def __init__(self, channel_id: str) -> None:
+        self.channel_id = channel_id
+        self.channel_cache = ChannelCache(channel_id)
+
+    async def get_progress(self, record_id: str) -> timedelta | None:
+        # Fall back to DB, in case Redis was flushed
+        progress = await self.channel_cache.get_progress(record_id)
+        if progress is not None:
+            return progress
+        return await _read_position(self.channel_id, record_id)
+
+    async def checkpoint(self) -> None:
+        # Record live playback, so it gets written behind to DB as well
+        state = await self.channel_cache.state()
+        if state.projection is None or not state.play_status.playing:
+            return
+        await self.channel_cache.save_progress(
+            state.projection.record.record_id, state.play_status.position
+        )
+
+
+async def flush_progresses(channel_ids: list[str]) -> None:
+    """Write dirty watch progresses of channels to VideoRecord rows."""
+    positions = {}
+    for channel_id in channel_ids:
+        await ChannelProgressService(channel_id).checkpoint()
+        progresses = await ChannelCache(channel_id).pop_dirty_progresses()
+        if progresses:
+            positions[channel_id] = progresses
+
+    if positions:
+        count = await _write_positions(positions)
+        logger.info(f"Flushed {count} watch progresses to DB")
+
+
+@sync_to_async
+def _read_position(channel_id: str, record_id: str) -> timedelta | None:
+    position = (
+        models.VideoRecord.objects.filter(channel_id=channel_id, record_id=record_id)
+        .values_list("position", flat=True)
+        .first()
+    )
+    return position or None
+
+
+@sync_to_async
+def _write_positions(positions: dict[str, dict[str, timedelta]]) -> int:
+    records = []
+    for channel_id, progresses in positions.items():
+        for record in models.VideoRecord.objects.filter(
+            channel_id=channel_id, record_id__in=progresses.keys()
+        ):
+            record.position = progresses[record.record_id]
+            records.append(record)
+
+    return models.VideoRecord.objects.bulk_update(records, ["position"], batch_size=100)
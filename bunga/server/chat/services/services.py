@@ -1,6 +1,5 @@
 import functools
 from typing import Callable, Awaitable, Any
-from dacite import Config, from_dict
 
 from utils.log import logger
 from ..utils import send_message
@@ -22,58 +21,56 @@ class ChatService(metaclass=MultitonMeta):
 
     @staticmethod
     def _require_watcher(
-        func: Callable[[ChatService, UserInfo, Any], Awaitable[None]],
-    ) -> Callable[[ChatService, str, Any], Awaitable[None]]:
+        func: Callable[[ChatService, UserInfo, Any], Awaitable[bool]],
+    ) -> Callable[[ChatService, str, Any], Awaitable[bool]]:
         @functools.wraps(func)
-        async def wrapper(self: ChatService, sender_id: str, data: Any):
-            sender = self.channel_cache.get_watcher_info(sender_id)
+        async def wrapper(
+            self: ChatService,
+            sender_id: str,
+            data: Any,
+            sender: UserInfo | None = None,
+        ):
+            # The consumer passes its own info if it holds it
+            if sender is None:
+                sender = await self.channel_cache.get_watcher_info(sender_id)
             if sender is None:
                 logger.warning("Unknown sender %s", sender_id)
                 await send_message(
                     self.channel_id, "who-are-you", receiver_id=sender_id
                 )
-                return None
+                return False
 
-            await func(self, sender, data)
+            return await func(self, sender, data)
 
+        wrapper.requires_watcher = True
         return wrapper
 
-    async def dispatch(self, code: str, sender_id: str, json_data: dict) -> None:
-        self.channel_cache.set_watcher_active(sender_id)
-
-        METHOD_MAP = {
-            "whats-on": self._handle_whats_on,
-            "join-in": self._handle_join_in,
-            "start-projection": self._handle_start_projection,
-            "bye": self._handle_bye,
-            "client-status": self._handle_buffer_state_changed,
-            "play": self._handle_play,
-            "pause": self._handle_pause,
-            "seek": self._handle_seek,
-            "call": self._handle_call,
-            "talk-status": self._handle_talk_status,
-            "play-finished": self._handle_play_finished,
-        }
-        handler = METHOD_MAP.get(code)
-        if handler is None:
-            return
-
-        if code not in PROTOCOL_MAP:
-            logger.warning("Unknown message received: %s", json_data)
-            return
-        schema_cls = PROTOCOL_MAP.get(code)
-        schema_data = (
-            from_dict(schema_cls, json_data, Config(cast=[Enum]))
-            if schema_cls
-            else None
-        )
-
-        return await handler(sender_id, schema_data)
-
-    async def _handle_whats_on(self, sender_id: str, _: None) -> None:
-        projection = self.channel_cache.current_projection
+    async def dispatch(
+        self,
+        code: str,
+        sender_id: str,
+        json_data: dict,
+        sender: UserInfo | None = None,
+    ) -> bool:
+        """Handle a client message; the sender's heartbeat is up to the caller.
+
+        sender is the watcher info of sender_id if known, saving a lookup.
+        Returns whether watchers or channel status may have changed.
+        """
+        entry = self._DISPATCH.get(code)
+        if entry is None:
+            return False
+
+        handler, decode = entry
+        schema_data = decode(json_data) if decode else None
+        if getattr(handler, "requires_watcher", False):
+            return await handler(self, sender_id, schema_data, sender)
+        return await handler(self, sender_id, schema_data)
+
+    async def _handle_whats_on(self, sender_id: str, _: None) -> bool:
+        projection = await self.channel_cache.current_projection()
         if projection is None:
-            return
+            return False
 
         await send_message(
             self.channel_id,
@@ -81,23 +78,23 @@ class ChatService(metaclass=MultitonMeta):
             receiver_id=sender_id,
             data=NowPlayingSchema(record=projection.record, sharer=projection.sharer),
         )
+        return False
 
-    async def _handle_join_in(self, sender_id: str, schema_data: JoinInSchema) -> None:
+    async def _handle_join_in(self, sender_id: str, schema_data: JoinInSchema) -> bool:
         # Send current watcher list to client
         await send_message(
             self.channel_id,
             "here-are",
             receiver_id=sender_id,
-            data=HereAreSchema(
-                watchers=self.channel_cache.watcher_list,
-                buffering=self.channel_cache.buffering_ids,
-                talking=list(self.channel_cache.talking_ids),
-            ),
+            data=HereAreSchema.from_snapshot(await self.channel_cache.snapshot()),
         )
 
         # Join user into channel, tell others
         await self.presence.join_user(schema_data.user)
 
+        # Status broadcasts only carry changes, so start the client off
+        await self.presence.send_status(sender_id)
+
         # Apply projection if has, or tell client what is projected
         if schema_data.my_share is not None:
             await self._handle_start_projection(sender_id, schema_data.my_share)
@@ -106,14 +103,15 @@ class ChatService(metaclass=MultitonMeta):
                 self.channel_id,
                 "start-projection",
                 receiver_id=sender_id,
-                data=StartProjectionSchema.from_channel_cache(self.channel_cache),
+                data=await StartProjectionSchema.from_channel_cache(self.channel_cache),
             )
+        return True
 
     @_require_watcher
     async def _handle_start_projection(
         self, sender: UserInfo, schema_data: StartProjectionSchema
-    ) -> None:
-        current = self.channel_cache.current_projection
+    ) -> bool:
+        current = await self.channel_cache.current_projection()
         if (
             current is not None
             and current.record.record_id == schema_data.video_record.record_id
@@ -123,35 +121,49 @@ class ChatService(metaclass=MultitonMeta):
                 self.channel_id,
                 "start-projection",
                 receiver_id=sender.id,
-                data=StartProjectionSchema.from_channel_cache(self.channel_cache),
+                data=await StartProjectionSchema.from_channel_cache(self.channel_cache),
             )
-        else:
-            await self.presence.apply_new_projection(sender, schema_data)
+            return False
 
-    async def _handle_bye(self, sender_id: str, _: None) -> None:
-        await self.presence.leave_user(sender_id)
+        await self.presence.apply_new_projection(sender, schema_data)
+        return True
+
+    async def _handle_bye(self, sender_id: str, _: None) -> bool:
+        return await self.presence.leave_user(sender_id)
 
     @_require_watcher
     async def _handle_buffer_state_changed(
         self, sender: UserInfo, schema_data: ClientStatusSchema
-    ) -> None:
-        self.playback.update_client_state(
+    ) -> bool:
+        # Sent as a heartbeat too, mostly with nothing new
+        transition = await self.playback.update_client_state(
             sender=sender, is_pending=schema_data.is_pending
         )
+        return transition.changed or transition.ready_changed
+
+    async def _handle_play(self, _: str, __: None) -> bool:
+        return (await self.playback.on_play_request()).changed
 
-    async def _handle_play(self, _: str, __: None) -> None:
-        self.playback.on_play_request()
+    async def _handle_pause(self, _: str, schema_data: PauseSchema) -> bool:
+        # Moves the position even if paused already
+        await self.playback.on_pause_request(schema_data.delta)
+        return True
 
-    async def _handle_pause(self, _: str, schema_data: PauseSchema) -> None:
-        self.playback.on_pause_request(schema_data.delta)
+    async def _handle_seek(self, _: str, schema_data: SeekSchema) -> bool:
+        await self.playback.seek_to(schema_data.delta)
+        return True
 
-    async def _handle_seek(self, _: str, schema_data: SeekSchema) -> None:
-        self.playback.seek_to(schema_data.delta)
+    async def _handle_play_finished(self, *_, **__) -> bool:
+        await self.playback.finish_playing()
+        return True
 
-    async def _handle_play_finished(self, *_, **__) -> None:
-        self.playback.finish_playing()
+    async def _handle_sync_status(
+        self, sender_id: str, schema_data: SyncStatusSchema
+    ) -> bool:
+        await self.presence.send_status(sender_id, schema_data.version)
+        return False
 
-    async def _handle_call(self, sender_id: str, schema_data: CallSchema) -> None:
+    async def _handle_call(self, sender_id: str, schema_data: CallSchema) -> bool:
         match schema_data.action:
             case CallAction.CALL:
                 await self.voice_call.on_call(sender_id)
@@ -161,10 +173,34 @@ class ChatService(metaclass=MultitonMeta):
                 await self.voice_call.on_reject(sender_id)
             case CallAction.CANCEL:
                 await self.voice_call.on_cancel(sender_id)
+        # Pending call is part of channel status
+        return True
 
-    async def _handle_talk_status(self, sender_id: str, schema_data: TalkStatusSchema):
+    async def _handle_talk_status(
+        self, sender_id: str, schema_data: TalkStatusSchema
+    ) -> bool:
         match schema_data.status:
             case TalkStatus.START:
-                self.voice_call.on_talk_start(sender_id)
+                await self.voice_call.on_talk_start(sender_id)
             case TalkStatus.END:
-                self.voice_call.on_talk_end(sender_id)
+                await self.voice_call.on_talk_end(sender_id)
+        return True
+
+    # code -> (handler, decoder of its schema), built once
+    _DISPATCH = {
+        code: (handler, DECODERS.get(code))
+        for code, handler in {
+            "whats-on": _handle_whats_on,
+            "join-in": _handle_join_in,
+            "start-projection": _handle_start_projection,
+            "bye": _handle_bye,
+            "client-status": _handle_buffer_state_changed,
+            "play": _handle_play,
+            "pause": _handle_pause,
+            "seek": _handle_seek,
+            "call": _handle_call,
+            "talk-status": _handle_talk_status,
+            "play-finished": _handle_play_finished,
+            "sync-status": _handle_sync_status,
+        }.items()
+    }
@@ -12,10 +12,13 @@ class ChannelVoiceCallService(metaclass=MultitonMeta):
         self.channel_cache = ChannelCache(channel_id)
 
     async def on_call(self, caller_id: str) -> None:
-        if self.channel_cache.has_pending_call or self.channel_cache.is_talking:
+        if (
+            await self.channel_cache.has_pending_call()
+            or await self.channel_cache.is_talking()
+        ):
             await self.on_accept()
         else:
-            if not self.channel_cache.init_call_pending_ids(caller_id):
+            if not await self.channel_cache.init_call_pending_ids(caller_id):
                 await self._all_call_rejected()
             else:
                 await broadcast_message(
@@ -25,12 +28,12 @@ class ChannelVoiceCallService(metaclass=MultitonMeta):
                 )
 
     async def on_reject(self, rejector_id: str) -> None:
-        self.channel_cache.remove_call_pending_id(rejector_id)
-        if not self.channel_cache.has_pending_call:
+        await self.channel_cache.remove_call_pending_id(rejector_id)
+        if not await self.channel_cache.has_pending_call():
             await self._all_call_rejected()
 
     async def on_accept(self) -> None:
-        self.channel_cache.clear_call_pending_ids()
+        await self.channel_cache.clear_call_pending_ids()
         await broadcast_message(
             channel_id=self.channel_id,
             code="call",
@@ -38,21 +41,21 @@ class ChannelVoiceCallService(metaclass=MultitonMeta):
         )
 
     async def on_cancel(self, _: str) -> None:
-        self.channel_cache.clear_call_pending_ids()
+        await self.channel_cache.clear_call_pending_ids()
         await broadcast_message(
             channel_id=self.channel_id,
             code="call",
             data=CallSchema(CallAction.CANCEL),
         )
 
-    def on_talk_start(self, talker_id: str) -> None:
-        self.channel_cache.add_talking_id(talker_id)
+    async def on_talk_start(self, talker_id: str) -> None:
+        await self.channel_cache.add_talking_id(talker_id)
 
-    def on_talk_end(self, talker_id: str) -> None:
-        self.channel_cache.remove_talking_id(talker_id)
+    async def on_talk_end(self, talker_id: str) -> None:
+        await self.channel_cache.remove_talking_id(talker_id)
 
     async def _all_call_rejected(self) -> None:
-        if self.channel_cache.has_pending_call:
+        if await self.channel_cache.has_pending_call():
             raise Exception("Cannot reject call when there is pending call.")
         await broadcast_message(
             channel_id=self.channel_id,
@@ -2,11 +2,51 @@
 
 from typing import Any
 from dataclasses import asdict
+import json
 
 from channels.layers import get_channel_layer
 
 from utils.log import logger
 from .channel_cache import ChannelCache, UserInfo
+from .protocol import pack_data
+
+
+def encode_frame(code: str, sender: dict, data: dict | None = None) -> str:
+    """Websocket frame of a message, as sent to clients."""
+    return json.dumps(
+        dict(code=code, sender=sender, **(data or {})), ensure_ascii=False
+    )
+
+
+def frame_event(
+    code: str,
+    sender: dict,
+    data: dict | None = None,
+    excludes: list[str] | None = None,
+) -> dict[str, Any]:
+    # Encoded once here, receiving consumers write the frame as is; binary
+    # clients get it repacked, see packed_frame_data
+    return {
+        "type": "message.frame",
+        "code": code,
+        "frame": encode_frame(code, sender, data),
+        "sender": sender,
+        "excludes": excludes,
+    }
+
+
+def packed_frame_data(event: dict[str, Any]) -> bytes:
+    """Data of a frame event packed for binary clients.
+
+    Packed on first use and kept on the event, which the consumers of a
+    process share, so rooms without binary clients never pay for it.
+    """
+    packed = event.get("packed")
+    if packed is None:
+        data = json.loads(event["frame"])
+        del data["code"], data["sender"]
+        packed = event["packed"] = pack_data(data or None)
+    return packed
 
 
 async def broadcast_message(
@@ -17,13 +57,9 @@ async def broadcast_message(
     data: Any = None,
     excludes: list[str] | None = None,
 ) -> None:
-    event = {
-        "type": "message.received",
-        "code": code,
-        "sender": asdict(sender),
-        "data": asdict(data) if data is not None else None,
-        "excludes": excludes,
-    }
+    event = frame_event(
+        code, asdict(sender), asdict(data) if data is not None else None, excludes
+    )
 
     layer = get_channel_layer()
     assert layer != None
@@ -40,18 +76,26 @@ async def send_message(
     sender: UserInfo = UserInfo.server,
     data: Any = None,
 ) -> None:
-    event = {
-        "type": "message.received",
-        "code": code,
-        "sender": asdict(sender),
-        "data": asdict(data) if data is not None else None,
-    }
+    event = frame_event(
+        code, asdict(sender), asdict(data) if data is not None else None
+    )
+    return await send_event(channel_id, receiver_id, event)
+
+
+async def broadcast_event(channel_id: str, event: dict) -> None:
+    """Send a channel layer event to every consumer of a channel."""
+    layer = get_channel_layer()
+    assert layer != None
+    return await layer.group_send(f"room_{channel_id}", event)
+
 
+async def send_event(channel_id: str, receiver_id: str, event: dict) -> None:
+    """Send a channel layer event to the consumer of a user."""
     layer = get_channel_layer()
     assert layer != None
 
     channel_cache = ChannelCache(channel_id)
-    client_name = channel_cache.get_client_name(receiver_id)
+    client_name = await channel_cache.get_client_name(receiver_id)
     if not client_name:
         logger.warning(f"No client of user id {receiver_id}")
         return
@@ -0,0 +1,78 @@
+# PEP-8
+
+from enum import Enum
+import timeit
+
+from dacite import Config, from_dict
+from django.core.management.base import BaseCommand
+
+from server.chat.schemas import DECODERS, PROTOCOL_MAP
+
+# A typical message of each code with a schema, and forms clients also send
+SAMPLES = {
+    "now-playing": {
+        "record": {
+            "record_id": "r1",
+            "title": "Title",
+            "source": "local",
+            "path": "/videos/1.mp4",
+            "thumb_url": None,
+        },
+        "sharer": {"id": "u1", "name": "User", "color_hue": 120},
+    },
+    "join-in": {
+        "user": {"id": "u1", "name": "User", "color_hue": 120},
+        "my_share": None,
+    },
+    "start-projection": {
+        "video_record": {
+            "record_id": "r1",
+            "title": "Title",
+            "source": "local",
+            "path": "/videos/1.mp4",
+        },
+        "position": 1_000_000,
+    },
+    "here-are": {
+        "watchers": [{"id": f"u{i}", "name": "User"} for i in range(8)],
+        "buffering": ["u1"],
+        "talking": [],
+    },
+    "client-status": {"is_pending": False},
+    "pause": {"position": 1_000_000},
+    "pause (no position)": {},
+    "seek": {"position": 1_000_000},
+    "call": {"action": "accept"},
+    "talk-status": {"status": "start"},
+    "sync-status": {"version": 3},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the per-message cost of decoding chat messages with dacite "
+        "and with the decoders compiled from the schemas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--number", type=int, default=20000)
+
+    def handle(self, *args, **options):
+        number = options["number"]
+        self.stdout.write(f"{'code':<22}{'dacite µs':>12}{'compiled µs':>14}{'x':>8}")
+        for name, data in SAMPLES.items():
+            # Other forms of a code are named "code (variant)"
+            code = name.split(" ")[0]
+            schema = PROTOCOL_MAP[code]
+            decode = DECODERS[code]
+            if decode(data) != from_dict(schema, data, Config(cast=[Enum])):
+                raise AssertionError(f"Decoders disagree on {name}")
+
+            baseline = timeit.timeit(
+                lambda: from_dict(schema, data, Config(cast=[Enum])), number=number
+            )
+            compiled = timeit.timeit(lambda: decode(data), number=number)
+            self.stdout.write(
+                f"{name:<22}{baseline / number * 1e6:>12.2f}"
+                f"{compiled / number * 1e6:>14.2f}{baseline / compiled:>8.1f}"
+            )
@@ -0,0 +1,202 @@
+# PEP-8
+
+from datetime import datetime
+import io
+import json
+import pickle
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache as Cache
+from django.core.management.base import BaseCommand
+
+from utils.datetime import get_total_microseconds
+from server.chat.channel_cache import (
+    ChannelState,
+    ChannelStatus,
+    PlayStatus,
+    RedisChannelCache,
+)
+from server.chat.redis_pool import shard_clients
+from server.chat.scripts import STATE_LAYOUT_VERSION
+
+LEGACY_FIELDS = ("projection", "channel_status", "play_status")
+
+
+class _LegacyPlayStatus:
+    # Stand-in for the pickled PlayStatus of the old layout, which kept a
+    # timedelta _position and a naive datetime _play_at
+    pass
+
+
+class _LegacyUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        if module == "server.chat.channel_cache" and name == "PlayStatus":
+            return _LegacyPlayStatus
+        return super().find_class(module, name)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move channel state from the legacy pickled cache keys, and from "
+        "older layouts of the state hash, into the current state hash."
+    )
+
+    def handle(self, *args, **options):
+        migrated = 0
+        client = getattr(Cache, "_cache").get_client()
+        for channel_id in self._legacy_channel_ids(client):
+            keys = [
+                Cache.make_key(f"bunga:channel:{channel_id}:{name}")
+                for name in LEGACY_FIELDS
+            ]
+            projection, status, play_status = [
+                self._unpickle(raw) for raw in client.mget(keys)
+            ]
+
+            state = ChannelState(
+                status=self._decode_status(status),
+                play_status=self._decode_play_status(play_status),
+                projection=projection,
+            )
+            if async_to_sync(self._write_state)(channel_id, state):
+                migrated += 1
+            client.delete(*keys)
+
+        upgraded = async_to_sync(self._upgrade_states)()
+        indexed = async_to_sync(self._index_progresses)()
+        heartbeats = async_to_sync(self._convert_heartbeats)()
+        mirrored = async_to_sync(self._mirror_watcher_ids)()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Migrated {migrated} legacy channel(s), "
+                f"upgraded {upgraded} state hash(es), "
+                f"indexed {indexed} watch progress(es), "
+                f"converted {heartbeats} heartbeat(s), "
+                f"mirrored {mirrored} watcher id(s)."
+            )
+        )
+
+    def _legacy_channel_ids(self, client) -> set[str]:
+        prefix = Cache.make_key("bunga:channel:")
+
+        channel_ids = set()
+        for raw_key in client.scan_iter(match=f"{prefix}*"):
+            key = raw_key.decode() if isinstance(raw_key, bytes) else raw_key
+            channel_id, _, name = key.removeprefix(prefix).rpartition(":")
+            if name in LEGACY_FIELDS:
+                channel_ids.add(channel_id)
+        return channel_ids
+
+    @staticmethod
+    def _unpickle(raw: bytes | None):
+        if raw is None:
+            return None
+        return _LegacyUnpickler(io.BytesIO(raw)).load()
+
+    @staticmethod
+    def _decode_status(value) -> ChannelStatus:
+        try:
+            return ChannelStatus(value)
+        except ValueError:
+            return ChannelStatus.PAUSED
+
+    @staticmethod
+    def _decode_play_status(value) -> PlayStatus:
+        if value is None:
+            return PlayStatus()
+
+        play_at = getattr(value, "_play_at", None)
+        return PlayStatus(
+            anchor_position=get_total_microseconds(value._position),
+            anchor_at=int(play_at.timestamp() * 1_000_000) if play_at else 0,
+            rate=1.0 if play_at else 0.0,
+        )
+
+    @staticmethod
+    async def _write_state(channel_id: str, state: ChannelState) -> bool:
+        channel_cache = RedisChannelCache(channel_id)
+        key = channel_cache.keys.state
+        if await channel_cache.redis.exists(key):
+            # Already written by the new layout, it is more recent
+            return False
+
+        await channel_cache.redis.hset(key, mapping=state.to_fields())
+        return True
+
+    @staticmethod
+    async def _upgrade_states() -> int:
+        pattern = RedisChannelCache.Keys.pattern("state")
+
+        upgraded = 0
+        async for redis, key in _scan(pattern):
+            fields = await redis.hgetall(key)
+            if fields.get("v") == str(STATE_LAYOUT_VERSION):
+                continue
+
+            pipe = redis.pipeline(transaction=True)
+            pipe.delete(key)
+            pipe.hset(key, mapping=ChannelState.from_fields(fields).to_fields())
+            await pipe.execute()
+            upgraded += 1
+        return upgraded
+
+    @staticmethod
+    async def _index_progresses() -> int:
+        # Progresses saved before they had an eviction index
+        pattern = RedisChannelCache.Keys.pattern("watch_progresses")
+
+        indexed = 0
+        async for redis, key in _scan(pattern):
+            scores = {}
+            for record_id, raw_data in (await redis.hgetall(key)).items():
+                try:
+                    updated_at = json.loads(raw_data)["updated_at"]
+                    scores[record_id] = datetime.fromisoformat(updated_at).timestamp()
+                except (KeyError, TypeError, ValueError):
+                    scores[record_id] = 0
+            if scores:
+                indexed += await redis.zadd(f"{key}_index", scores, nx=True)
+        return indexed
+
+    @staticmethod
+    async def _convert_heartbeats() -> int:
+        # Last active timestamps used to be a hash, now a sorted set
+        pattern = RedisChannelCache.Keys.pattern("watchers_last_active")
+
+        converted = 0
+        async for redis, key in _scan(pattern):
+            scores = {}
+            for watcher_id, raw_timestamp in (await redis.hgetall(key)).items():
+                try:
+                    scores[watcher_id] = float(raw_timestamp)
+                except ValueError:
+                    continue
+
+            new_key = key.removesuffix("watchers_last_active") + "watchers_heartbeat"
+            pipe = redis.pipeline(transaction=True)
+            if scores:
+                pipe.zadd(new_key, scores, nx=True)
+            pipe.delete(key)
+            await pipe.execute()
+            converted += len(scores)
+        return converted
+
+    @staticmethod
+    async def _mirror_watcher_ids() -> int:
+        # Watcher ids are mirrored in a set, for set algebra in Redis
+        pattern = RedisChannelCache.Keys.pattern("watchers")
+
+        mirrored = 0
+        async for redis, key in _scan(pattern):
+            watcher_ids = await redis.hkeys(key)
+            if watcher_ids:
+                mirrored += await redis.sadd(
+                    key.removesuffix("watchers") + "watcher_ids", *watcher_ids
+                )
+        return mirrored
+
+
+async def _scan(pattern: str):
+    for redis in shard_clients():
+        async for key in redis.scan_iter(match=pattern):
+            yield redis, key
@@ -0,0 +1,109 @@
+# PEP-8
+
+from datetime import timedelta
+from unittest import IsolatedAsyncioTestCase
+
+from server.chat.channel_cache import (
+    ChannelStatus,
+    MemoryChannelCache,
+    RedisChannelCache,
+    UserInfo,
+)
+from .utils import requires_redis, unique_name
+
+
+class ChannelCacheBehaviour:
+    """Tests both backends pass the same, run by a case per backend."""
+
+    cache_class: type
+
+    async def asyncSetUp(self):
+        self.cache = self.cache_class(unique_name("test-"))
+
+    async def asyncTearDown(self):
+        await self.cache.reset()
+
+    async def test_play_waits_for_buffering_watchers(self):
+        await self.cache.upsert_watcher(UserInfo(id="a", name="A"))
+
+        transition = await self.cache.request_play()
+        self.assertEqual(transition.previous, ChannelStatus.PAUSED)
+        self.assertEqual(transition.current, ChannelStatus.PENDING)
+
+        transition = await self.cache.set_watcher_status("a", is_pending=False)
+        self.assertEqual(transition.current, ChannelStatus.PLAYING)
+        self.assertTrue(transition.ready_changed)
+        self.assertEqual(transition.play_status.rate, 1.0)
+
+        transition = await self.cache.set_watcher_status("a", is_pending=False)
+        self.assertFalse(transition.changed)
+        self.assertFalse(transition.ready_changed)
+
+    async def test_translate_applies_position(self):
+        await self.cache.upsert_watcher(UserInfo(id="a", name="A"))
+        await self.cache.set_watcher_status("a", is_pending=False)
+        await self.cache.request_play()
+
+        transition = await self.cache.translate_status(
+            ChannelStatus.PAUSED, timedelta(seconds=5)
+        )
+        self.assertEqual(transition.current, ChannelStatus.PAUSED)
+        self.assertEqual(transition.play_status.rate, 0.0)
+        self.assertEqual(transition.play_status.position, timedelta(seconds=5))
+
+    async def test_publish_status_bumps_version_on_change_only(self):
+        first = await self.cache.publish_status('{"n": 1}')
+        self.assertTrue(first.changed)
+        self.assertIsNone(first.previous)
+
+        same = await self.cache.publish_status('{"n": 1}')
+        self.assertFalse(same.changed)
+        self.assertEqual(same.version, first.version)
+
+        changed = await self.cache.publish_status('{"n": 2}')
+        self.assertTrue(changed.changed)
+        self.assertEqual(changed.version, first.version + 1)
+        self.assertEqual(changed.previous, '{"n": 1}')
+
+        published = await self.cache.published_status()
+        self.assertEqual((published.version, published.body), (2, '{"n": 2}'))
+
+    async def test_status_version_survives_reset(self):
+        await self.cache.publish_status('{"n": 1}')
+        await self.cache.reset()
+        self.assertIsNone(await self.cache.published_status())
+
+        published = await self.cache.publish_status('{"n": 1}')
+        self.assertEqual(published.version, 2)
+
+    async def test_take_token_drops_over_burst(self):
+        waits = [await self.cache.take_token("a", "seek", 1, 2, 0) for _ in range(3)]
+        self.assertEqual(waits, [0, 0, None])
+        # Budgets are per user
+        self.assertEqual(await self.cache.take_token("b", "seek", 1, 2, 0), 0)
+
+    async def test_take_token_reserves_within_max_wait(self):
+        for _ in range(2):
+            await self.cache.take_token("a", "seek", 10, 2, 0)
+        wait = await self.cache.take_token("a", "seek", 10, 2, 0.5)
+        self.assertAlmostEqual(wait, 0.1, delta=0.02)
+
+
+class MemoryChannelCacheTests(ChannelCacheBehaviour, IsolatedAsyncioTestCase):
+    cache_class = MemoryChannelCache
+
+
+@requires_redis
+class RedisChannelCacheTests(ChannelCacheBehaviour, IsolatedAsyncioTestCase):
+    cache_class = RedisChannelCache
+
+    async def test_presence_lease_has_one_owner(self):
+        self.assertTrue(await self.cache.claim_presence("w1", 10))
+        self.assertFalse(await self.cache.claim_presence("w2", 10))
+        # Renewed by its owner, not released by others
+        self.assertTrue(await self.cache.claim_presence("w1", 10))
+        await self.cache.release_presence("w2")
+        self.assertFalse(await self.cache.claim_presence("w2", 10))
+
+        await self.cache.release_presence("w1")
+        self.assertTrue(await self.cache.claim_presence("w2", 10))
@@ -0,0 +1,55 @@
+# PEP-8
+
+import asyncio
+
+from django.test import SimpleTestCase
+
+from server.chat.channel_layer import RoomFanoutChannelLayer
+from .utils import redis_url, requires_redis, unique_name
+
+
+@requires_redis
+class RoomFanoutChannelLayerTests(SimpleTestCase):
+    def make_layer(self) -> RoomFanoutChannelLayer:
+        return RoomFanoutChannelLayer(
+            hosts=[redis_url()], prefix=unique_name("test-layer-")
+        )
+
+    async def test_group_send_reaches_every_local_member(self):
+        layer = self.make_layer()
+        group = unique_name("room_")
+        a, b = await layer.new_channel(), await layer.new_channel()
+        await layer.group_add(group, a)
+        await layer.group_add(group, b)
+
+        # Both wait first, so one of them holds the receive lock and pops
+        # Redis for the process
+        receives = [asyncio.create_task(layer.receive(c)) for c in (a, b)]
+        await asyncio.sleep(0.1)
+        await layer.group_send(group, {"type": "message.frame", "n": 1})
+
+        async with asyncio.timeout(2):
+            messages = await asyncio.gather(*receives)
+        self.assertEqual([m["n"] for m in messages], [1, 1])
+        await layer.flush()
+
+    async def test_members_of_other_processes_get_group_messages(self):
+        sender, receiver = self.make_layer(), self.make_layer()
+        receiver.prefix = sender.prefix
+        group = unique_name("room_")
+        channel = await receiver.new_channel()
+        await receiver.group_add(group, channel)
+
+        await sender.group_send(group, {"type": "message.frame", "n": 2})
+        async with asyncio.timeout(2):
+            message = await receiver.receive(channel)
+        self.assertEqual(message["n"], 2)
+
+    async def test_direct_send_still_reaches_local_channel(self):
+        layer = self.make_layer()
+        channel = await layer.new_channel()
+        await layer.send(channel, {"type": "message.frame", "n": 3})
+        async with asyncio.timeout(2):
+            message = await layer.receive(channel)
+        self.assertEqual(message["n"], 3)
+        await layer.flush()
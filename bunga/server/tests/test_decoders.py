@@ -0,0 +1,15 @@
+# PEP-8
+
+from django.test import SimpleTestCase
+
+from server.chat.schemas import DECODERS, PauseSchema
+from utils.decoders import SchemaError
+
+
+class DecoderTests(SimpleTestCase):
+    def test_missing_optional_is_none(self):
+        self.assertEqual(DECODERS["pause"]({}), PauseSchema(position=None))
+
+    def test_missing_required_raises(self):
+        with self.assertRaises(SchemaError):
+            DECODERS["seek"]({})
@@ -0,0 +1,56 @@
+# PEP-8
+
+import asyncio
+
+from django.test import SimpleTestCase
+
+from server.chat.outbound_queue import OutboundQueue, QueueOverflow
+
+
+class OutboundQueueTests(SimpleTestCase):
+    async def drain(self, queue: OutboundQueue) -> list:
+        events = []
+        while len(queue):
+            events.append((await queue.get())["n"])
+        return events
+
+    async def test_channel_status_supersedes_pending_status(self):
+        queue = OutboundQueue(10)
+        queue.put("channel-status", {"n": 1})
+        queue.put("play", {"n": 2})
+        queue.put("channel-status-delta", {"n": 3})
+        self.assertEqual(queue.put("channel-status", {"n": 4}), 2)
+
+        self.assertEqual(await self.drain(queue), [2, 4])
+
+    async def test_delta_does_not_supersede(self):
+        queue = OutboundQueue(10)
+        queue.put("channel-status", {"n": 1})
+        self.assertEqual(queue.put("channel-status-delta", {"n": 2}), 0)
+        self.assertEqual(await self.drain(queue), [1, 2])
+
+    def test_overflow_on_ordered_messages(self):
+        queue = OutboundQueue(2)
+        queue.put("play", {"n": 1})
+        queue.put("pause", {"n": 2})
+        with self.assertRaises(QueueOverflow):
+            queue.put("seek", {"n": 3})
+
+    def test_superseded_entries_do_not_pile_up(self):
+        queue = OutboundQueue(4)
+        for n in range(1000):
+            queue.put("channel-status", {"n": n})
+        self.assertEqual(len(queue), 1)
+        self.assertLessEqual(len(queue._entries), 2 * queue.maxsize)
+
+    async def test_close_ends_get(self):
+        queue = OutboundQueue(4)
+        getter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        queue.put("play", {"n": 1})
+        self.assertEqual((await getter)["n"], 1)
+
+        queue.put("play", {"n": 2})
+        queue.close()
+        self.assertIsNone(await queue.get())
+        self.assertEqual(queue.put("play", {"n": 3}), 0)
@@ -0,0 +1,67 @@
+# PEP-8
+
+from collections import Counter
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from utils.hash_ring import HashRing
+from utils.token_bucket import TokenBucket
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch("utils.token_bucket.time.monotonic", return_value=0.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_drop(self):
+        bucket = TokenBucket(rate=2, burst=3)
+        self.assertEqual([bucket.take() for _ in range(4)], [0, 0, 0, None])
+
+    def test_refills_at_rate(self):
+        bucket = TokenBucket(rate=2, burst=3)
+        for _ in range(3):
+            bucket.take()
+        self.clock.return_value = 0.5
+        self.assertEqual(bucket.take(), 0)
+        self.assertIsNone(bucket.take())
+
+    def test_reserves_within_max_wait(self):
+        bucket = TokenBucket(rate=2, burst=1)
+        bucket.take()
+        self.assertEqual(bucket.take(max_wait=1), 0.5)
+        # Owed tokens are waited for in turn
+        self.assertEqual(bucket.take(max_wait=1), 1.0)
+        self.assertIsNone(bucket.take(max_wait=1))
+
+    def test_refund(self):
+        bucket = TokenBucket(rate=1, burst=1)
+        bucket.take()
+        bucket.refund()
+        self.assertEqual(bucket.take(), 0)
+        bucket.refund()
+        bucket.refund()
+        self.assertEqual(bucket.tokens, 1)
+
+
+class HashRingTests(SimpleTestCase):
+    keys = [f"channel-{i}" for i in range(2000)]
+
+    def test_single_node(self):
+        ring = HashRing(["a"])
+        self.assertEqual({ring.node_of(key) for key in self.keys}, {"a"})
+
+    def test_spreads_keys(self):
+        ring = HashRing(["a", "b", "c", "d"])
+        counts = Counter(ring.node_of(key) for key in self.keys)
+        self.assertEqual(counts.keys(), {"a", "b", "c", "d"})
+        for count in counts.values():
+            self.assertGreater(count, len(self.keys) / 4 * 0.7)
+
+    def test_removing_a_node_moves_only_its_keys(self):
+        before = HashRing(["a", "b", "c"])
+        after = HashRing(["a", "c"])
+        for key in self.keys:
+            if before.node_of(key) != "b":
+                self.assertEqual(after.node_of(key), before.node_of(key))
@@ -0,0 +1,38 @@
+# PEP-8
+
+import asyncio
+import unittest
+import uuid
+
+from django.conf import settings
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+
+def redis_url() -> str:
+    return f"redis://{settings.REDIS_HOST['host']}:{settings.REDIS_HOST['port']}/0"
+
+
+def unique_name(prefix: str) -> str:
+    """Name of keys, groups or channels no other test run uses."""
+    return f"{prefix}{uuid.uuid4().hex}"
+
+
+def _redis_available() -> bool:
+    async def ping() -> bool:
+        client = aioredis.Redis.from_url(redis_url(), socket_connect_timeout=1)
+        try:
+            return await client.ping()
+        except (RedisError, OSError):
+            return False
+        finally:
+            await client.aclose()
+
+    return asyncio.run(ping())
+
+
+def requires_redis(cls: type) -> type:
+    """Skip a test case when the Redis of settings.REDIS_HOST is not up."""
+    if not _redis_available():
+        return unittest.skip("Redis is not available")(cls)
+    return cls
@@ -43,6 +43,7 @@ api_patterns = [
     path("chat/config", api.IMKey.as_view(), name="chat-config"),
     path("voice/config", api.VoiceKey.as_view(), name="voice-config"),
     path("monitor/logs", api.monitor_logs, name="monitor-logs"),
+    path("monitor/metrics", api.monitor_metrics, name="monitor-metrics"),
     path("monitor/<str:channel_id>/cache", api.monitor_cache, name="monitor-cache"),
     path(
         "monitor/<str:channel_id>/reset",
@@ -9,6 +9,7 @@ from rest_framework.response import Response
 
 from server.chat.utils import broadcast_message
 from server.chat.channel_cache import ChannelCache
+from server.chat.metrics import metrics
 from server import models, serializers
 
 
@@ -53,6 +54,13 @@ def monitor_logs(request):
     return Response({"logs": logs})
 
 
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def monitor_metrics(request):
+    """Get the latest metrics published by each web and worker process"""
+    return Response(async_to_sync(metrics.collect)())
+
+
 @api_view(["GET"])
 @permission_classes([IsAdminUser])
 def monitor_cache(request, channel_id: str):
@@ -63,41 +71,47 @@ def monitor_cache(request, channel_id: str):
         return Response({"error": "channel not found"}, status=404)
 
     try:
-        channel_cache = ChannelCache(channel_id)
-        cache_info = {
-            "channel_id": channel_id,
-            "channel_status": str(channel_cache.channel_status.name),
-            "current_projection": None,
-            "watcher_list": [asdict(w) for w in channel_cache.watcher_list],
-            "watcher_count": len(channel_cache.watcher_list),
-            "ready_watchers": list(channel_cache.ready_ids),
-            "talking_watchers": list(channel_cache.talking_ids),
-            "has_pending_call": channel_cache.has_pending_call,
-            "play_status": (
-                {
-                    "playing": channel_cache.play_status.playing,
-                    "position_seconds": channel_cache.play_status.position.total_seconds(),
-                }
-                if channel_cache.play_status
-                else None
-            ),
-        }
-
-        if channel_cache.current_projection:
-            proj = channel_cache.current_projection
-            cache_info["current_projection"] = {
-                "record_id": proj.record.record_id,
-                "title": proj.record.title,
-                "source": proj.record.source,
-                "sharer_id": proj.sharer.id,
-                "sharer_name": proj.sharer.name,
-            }
-
+        cache_info = async_to_sync(_collect_cache_info)(channel_id)
         return Response(cache_info)
     except Exception as e:
         return Response({"error": str(e)}, status=500)
 
 
+async def _collect_cache_info(channel_id: str) -> dict:
+    snapshot = await ChannelCache(channel_id).snapshot()
+    play_status = snapshot.play_status
+    cache_info = {
+        "channel_id": channel_id,
+        "channel_status": str(snapshot.channel_status.name),
+        "current_projection": None,
+        "watcher_list": [asdict(w) for w in snapshot.watchers],
+        "watcher_count": len(snapshot.watchers),
+        "ready_watchers": list(snapshot.ready_ids),
+        "talking_watchers": list(snapshot.talking_ids),
+        "has_pending_call": snapshot.has_pending_call,
+        "play_status": (
+            {
+                "playing": play_status.playing,
+                "position_seconds": play_status.position.total_seconds(),
+            }
+            if play_status
+            else None
+        ),
+    }
+
+    proj = snapshot.projection
+    if proj:
+        cache_info["current_projection"] = {
+            "record_id": proj.record.record_id,
+            "title": proj.record.title,
+            "source": proj.record.source,
+            "sharer_id": proj.sharer.id,
+            "sharer_name": proj.sharer.name,
+        }
+
+    return cache_info
+
+
 @api_view(["POST"])
 @permission_classes([IsAdminUser])
 def monitor_reset_channel(request, channel_id: str):
@@ -107,7 +121,7 @@ def monitor_reset_channel(request, channel_id: str):
     try:
         async_to_sync(broadcast_message)(channel_id, "reset")
         channel_cache = ChannelCache(channel_id)
-        channel_cache.reset()
+        async_to_sync(channel_cache.reset)()
         return Response({"message": "Channel state has been reset"}, status=200)
     except Exception as e:
         return Response({"error": str(e)}, status=500)
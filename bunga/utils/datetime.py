@@ -1,6 +1,11 @@
 # PEP-8
 from datetime import timedelta
+import time
 
 
 def get_total_microseconds(td: timedelta) -> int:
     return int(td.total_seconds() * 1_000_000)
+
+
+def get_epoch_microseconds() -> int:
+    return int(time.time() * 1_000_000)
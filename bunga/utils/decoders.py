@@ -0,0 +1,119 @@
+# PEP-8
+
+from dataclasses import MISSING, fields, is_dataclass
+from enum import Enum
+from types import NoneType, UnionType
+from typing import Any, Callable, Union, get_args, get_origin, get_type_hints
+
+Decoder = Callable[[Any], Any]
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def compile_decoder(cls: type) -> Decoder:
+    """Build a decoder of JSON data into the dataclass cls.
+
+    Type hints are resolved once here, the returned function only converts
+    and checks values. Nested dataclasses, enums, optionals, lists and dicts
+    are supported; unknown keys are ignored and missing optionals are None,
+    as dacite did.
+    """
+    hints = get_type_hints(cls)
+    # (name, decoder, default factory or None if required)
+    specs = []
+    for field in fields(cls):
+        if not field.init:
+            continue
+        if field.default is not MISSING:
+            default = lambda value=field.default: value
+        elif field.default_factory is not MISSING:
+            default = field.default_factory
+        elif _is_optional(hints[field.name]):
+            # Missing optionals are None, as in dacite
+            default = lambda: None
+        else:
+            default = None
+        specs.append((field.name, _compile(hints[field.name], field.name), default))
+
+    def decode(data: Any) -> Any:
+        if not isinstance(data, dict):
+            raise SchemaError(f"{cls.__name__} expects an object")
+        kwargs = {}
+        for name, decode_value, default in specs:
+            if name in data:
+                kwargs[name] = decode_value(data[name])
+            elif default is not None:
+                kwargs[name] = default()
+            else:
+                raise SchemaError(f"Missing {cls.__name__}.{name}")
+        return cls(**kwargs)
+
+    return decode
+
+
+def _is_optional(hint: Any) -> bool:
+    return get_origin(hint) in (Union, UnionType) and NoneType in get_args(hint)
+
+
+def _compile(hint: Any, path: str) -> Decoder:
+    origin = get_origin(hint)
+    if hint is Any:
+        return lambda value: value
+
+    if origin in (Union, UnionType):
+        args = get_args(hint)
+        inner_args = [arg for arg in args if arg is not NoneType]
+        if len(inner_args) != 1:
+            raise TypeError(f"Unsupported union {hint} of {path}")
+        inner = _compile(inner_args[0], path)
+        if NoneType not in args:
+            return inner
+        return lambda value: None if value is None else inner(value)
+
+    if origin is list:
+        (item_hint,) = get_args(hint)
+        item = _compile(item_hint, path)
+
+        def decode_list(value: Any) -> list:
+            if not isinstance(value, list):
+                raise SchemaError(f"{path} expects a list")
+            return [item(v) for v in value]
+
+        return decode_list
+
+    if origin is dict:
+        return _checked(dict, path)
+
+    if is_dataclass(hint):
+        return compile_decoder(hint)
+
+    if isinstance(hint, type) and issubclass(hint, Enum):
+
+        def decode_enum(value: Any) -> Enum:
+            try:
+                return hint(value)
+            except ValueError:
+                raise SchemaError(f"{path} has no value {value!r}") from None
+
+        return decode_enum
+
+    if hint is float:
+        # JSON does not tell 1 from 1.0
+        check_number = _checked((int, float), path)
+        return lambda value: float(check_number(value))
+
+    if hint in (str, int, bool):
+        return _checked(hint, path)
+
+    raise TypeError(f"Unsupported type {hint} of {path}")
+
+
+def _checked(types: type | tuple[type, ...], path: str) -> Decoder:
+    def check(value: Any) -> Any:
+        if not isinstance(value, types):
+            raise SchemaError(f"{path} has wrong type {type(value).__name__}")
+        return value
+
+    return check
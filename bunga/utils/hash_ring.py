@@ -0,0 +1,35 @@
+# PEP-8
+
+from bisect import bisect
+from collections.abc import Sequence
+import hashlib
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8])
+
+
+class HashRing:
+    """Consistent hashing of keys onto nodes.
+
+    Adding or removing a node only moves the keys next to its points on
+    the ring, more points per node spread keys evenly.
+    """
+
+    def __init__(self, nodes: Sequence[str], replicas: int = 160) -> None:
+        self.nodes = tuple(nodes)
+        points = sorted(
+            (_hash(f"{node}#{replica}"), index)
+            for index, node in enumerate(self.nodes)
+            for replica in range(replicas)
+        )
+        self._points = [point for point, _ in points]
+        self._indexes = [index for _, index in points]
+
+    def index_of(self, key: str) -> int:
+        if len(self.nodes) == 1:
+            return 0
+        return self._indexes[bisect(self._points, _hash(key)) % len(self._points)]
+
+    def node_of(self, key: str) -> str:
+        return self.nodes[self.index_of(key)]
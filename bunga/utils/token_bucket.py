@@ -0,0 +1,35 @@
+# PEP-8
+
+import time
+
+
+class TokenBucket:
+    """Allows rate events per second on average, and bursts of burst."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated_at")
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def take(self, max_wait: float = 0) -> float | None:
+        """Reserve a token, return seconds to wait before using it.
+
+        None, and nothing reserved, if that would be longer than max_wait.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+        wait = max(1 - self.tokens, 0) / self.rate
+        if wait > max_wait:
+            return None
+        # Goes below zero while waiting tokens are owed
+        self.tokens -= 1
+        return wait
+
+    def refund(self) -> None:
+        """Give back a token taken for an event that did not happen."""
+        self.tokens = min(self.burst, self.tokens + 1)